@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tournament.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,6 +38,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tournament.routing.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'taekwondoTournamentApi.urls'
@@ -68,9 +70,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Stand-in read replica. It is only used when TOURNAMENT_READ_REPLICA names it, and is not kept in sync.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+    },
 }
 
+DATABASE_ROUTERS = ['tournament.routing.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -115,4 +124,30 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
+    'DEFAULT_PAGINATION_CLASS': 'tournament.pagination.IdCursorPagination',
+    'DEFAULT_FILTER_BACKENDS': ['tournament.filters.RelationFilterBackend'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'tournament.profiling.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
+
+# Pools with more teams than this are split into sub-pools when making pools. None disables splitting.
+TOURNAMENT_MAX_POOL_SIZE = None
+
+# Pool jobs run on a local thread pool of this size. Eager jobs run inside the submitting request (used by tests).
+TOURNAMENT_JOB_WORKERS = 2
+TOURNAMENT_JOBS_EAGER = False
+# Seconds without progress after which a queued or running job is considered abandoned.
+TOURNAMENT_JOB_TIMEOUT = 600
+
+# Alias in DATABASES that safe requests to the tournament views read from. None reads from the primary.
+TOURNAMENT_READ_REPLICA = None
+# Seconds that a client keeps reading from the primary after a write. 0 disables pinning.
+TOURNAMENT_PRIMARY_PIN_SECONDS = 5
+
+# Seconds that the results of batched writes are kept, to be replayed to clients retrying with the same key.
+TOURNAMENT_IDEMPOTENCY_KEY_SECONDS = 24 * 60 * 60
+
+# Adds Server-Timing headers to responses and collects the request metrics served at metrics/.
+TOURNAMENT_PROFILING = True
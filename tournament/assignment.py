@@ -0,0 +1,112 @@
+import heapq
+import itertools
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tournament import models
+from tournament.changes import created_changes, record, updated_changes
+from tournament.rules import PoolKey, annotate_team_classification, team_pool_key, tournament_ruleset
+from tournament.versioning import deleted_directly, single_version_bump
+
+
+def has_made_pools(tournament_id: int) -> bool:
+    return models.Pool.objects.filter(tournament_id=tournament_id, class_level__isnull=False).exists()
+
+
+def assign_teams(
+        tournament: models.Tournament,
+        team_ids: Iterable[int],
+        max_pool_size: Optional[int] = None,
+) -> Dict[int, Optional[int]]:
+    """
+    Moves the given teams into the existing pool matching their classification, after `make_pools` has run.
+
+    Only teams that are unassigned or whose classification changed are written. Teams go one at a time into the
+    smallest matching sub-pool, and a pool is only created when none matches or all matching pools hold
+    `max_pool_size` teams. Pools left empty by a move are deleted unless they have rounds. Teams in pools created by
+    hand or in pools that already have rounds are left alone. The work depends on the number of teams given, not on
+    the size of the tournament. Returns the new pool id per moved team.
+    """
+    tournament_day = tournament.tournament_start.date()
+    ruleset = tournament_ruleset(tournament.pk)
+    teams = annotate_team_classification(
+        models.Team.objects.filter(tournament=tournament, pk__in=list(team_ids)).select_related("pool").annotate(
+            pool_started=Exists(models.Round.objects.filter(pool=OuterRef("pool"))),
+        ),
+        ruleset,
+    )
+    new_keys: Dict[int, Optional[PoolKey]] = {}
+    old_pool_ids = set()
+    for team in teams:
+        # Moving a team out of a started pool would orphan its turns.
+        if team.pool is not None and (team.pool.class_level is None or team.pool_started):
+            continue
+        key = team_pool_key(team, tournament_day, ruleset) if team.participant_count else None
+        if team.pool is not None and key == PoolKey.of(team.pool):
+            continue
+        new_keys[team.pk] = key
+        if team.pool_id is not None:
+            old_pool_ids.add(team.pool_id)
+    if not new_keys:
+        return {}
+
+    with transaction.atomic(), single_version_bump(pk=tournament.pk):
+        needed_keys = {key for key in new_keys.values() if key is not None}
+        # Per key, a heap of (team count, tiebreak, pool), so every team goes into the currently smallest pool.
+        heaps: Dict[PoolKey, List[Tuple[int, int, models.Pool]]] = defaultdict(list)
+        tiebreaks = itertools.count()
+        if needed_keys:
+            candidates = models.Pool.objects.filter(
+                reduce(or_, (key.pool_filter() for key in needed_keys)), tournament=tournament,
+            ).annotate(team_count=Count("teams")).order_by("team_count", "pk")
+            for pool in candidates:
+                heaps[PoolKey.of(pool)].append((pool.team_count, next(tiebreaks), pool))
+        created = []
+        placed: Dict[int, Optional[models.Pool]] = {}
+        for team_id, key in sorted(new_keys.items()):
+            if key is None:
+                placed[team_id] = None
+                continue
+            heap = heaps[key]
+            if not heap or (max_pool_size is not None and heap[0][0] >= max_pool_size):
+                created.append(key.make_pool(tournament))
+                heapq.heappush(heap, (0, next(tiebreaks), created[-1]))
+            team_count, order, pool = heapq.heappop(heap)
+            heapq.heappush(heap, (team_count + 1, order, pool))
+            placed[team_id] = pool
+        models.Pool.objects.bulk_create(created)
+        changes = created_changes(tournament.pk, created)
+
+        team_ids_by_pool = defaultdict(list)
+        for team_id, pool in placed.items():
+            team_ids_by_pool[pool.pk if pool is not None else None].append(team_id)
+        for pool_id, pool_team_ids in team_ids_by_pool.items():
+            models.Team.objects.filter(pk__in=pool_team_ids).update(pool_id=pool_id)
+            changes += updated_changes(tournament.pk, models.Team, pool_team_ids, pool=pool_id)
+        record(changes)
+
+        models.Pool.objects.filter(pk__in=old_pool_ids, teams__isnull=True).exclude(
+            Exists(models.Round.objects.filter(pool=OuterRef("pk")))
+        ).delete()
+    return {team_id: pool.pk if pool is not None else None for team_id, pool in placed.items()}
+
+
+@receiver(post_save, sender=models.Participant)
+@receiver(post_delete, sender=models.Participant)
+def participant_changed(sender, instance: models.Participant, raw: bool = False, **kwargs):
+    # Participants deleted along with their team or tournament need no new pool.
+    if raw or not deleted_directly(sender, kwargs.get("origin")):
+        return
+    tournament_id = models.Team.objects.filter(pk=instance.team_id).values_list("tournament_id", flat=True).first()
+    if tournament_id is not None and has_made_pools(tournament_id):
+        tournament = models.Tournament.objects.get(pk=tournament_id)
+        assign_teams(tournament, [instance.team_id], settings.TOURNAMENT_MAX_POOL_SIZE)
@@ -0,0 +1,88 @@
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, List
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from tournament import models
+from tournament.generation import GenerationParameters, generate_results, generate_tournament
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    wall_time_seconds: float
+    queries: int
+    peak_memory_bytes: int
+    status_code: int
+
+
+def measure(name: str, request: Callable) -> BenchmarkResult:
+    """ Runs a request once, recording its wall time, database queries and peak Python memory allocation. """
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            wall_time = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return BenchmarkResult(name, wall_time, len(queries), peak_memory, response.status_code)
+
+
+def run_benchmarks(parameters: GenerationParameters) -> dict:
+    """
+    Generates a tournament of the given size and benchmarks pool creation, list and detail endpoints, score entry
+    and export against it. Meant to run against a disposable database.
+    """
+    user, _ = User.objects.get_or_create(username="benchmark", defaults={"is_superuser": True, "is_staff": True})
+    client = APIClient()
+    client.force_authenticate(user)
+
+    tournament = generate_tournament(parameters, name="Benchmark tournament")
+    results: List[BenchmarkResult] = [
+        measure("make_pools", lambda: client.post(reverse("make-pools", args=[tournament.pk]))),
+    ]
+    generate_results(tournament, parameters)
+    pool = tournament.pools.first()
+    round_obj = models.Round.objects.filter(pool__tournament=tournament).first()
+    form = models.Form.objects.filter(turn__round=round_obj).first()
+
+    results += [
+        measure("tournament_detail", lambda: client.get(reverse("tournament-detail", args=[tournament.pk]))),
+        measure("tournament_snapshot", lambda: client.get(reverse("tournament-snapshot", args=[tournament.pk]))),
+        measure("pool_detail", lambda: client.get(reverse("pool-detail", args=[pool.pk]))),
+        measure("team_list", lambda: client.get(reverse("team-list"), {"tournament": tournament.pk})),
+        measure("participant_list", lambda: client.get(reverse("participant-list"), {"tournament": tournament.pk})),
+        measure("score_list", lambda: client.get(reverse("score-list"), {"tournament": tournament.pk})),
+        measure("round_standings", lambda: client.get(reverse("round-standings", args=[round_obj.pk]))),
+        measure("score_entry", lambda: client.post(
+            reverse("score-list"), {"form": form.pk, "technique_score": 7, "presentation_score": 8},
+        )),
+        measure("export_csv", lambda: client.get(reverse("export-results", args=[tournament.pk, "csv"]))),
+        measure("export_ndjson", lambda: client.get(reverse("export-results", args=[tournament.pk, "ndjson"]))),
+    ]
+    return {
+        "created": timezone.now().isoformat(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "parameters": asdict(parameters),
+        "counts": {
+            "teams": models.Team.objects.filter(tournament=tournament).count(),
+            "participants": models.Participant.objects.filter(team__tournament=tournament).count(),
+            "pools": tournament.pools.count(),
+            "scores": models.Score.objects.filter(form__turn__round__pool__tournament=tournament).count(),
+        },
+        "results": [asdict(result) for result in results],
+    }
@@ -0,0 +1,119 @@
+from functools import lru_cache
+from typing import FrozenSet, Iterable, List, Type, Union
+
+from django.db.models import CASCADE, Model, QuerySet, Subquery
+from django.db.models.signals import post_delete, post_save
+
+from tournament import models
+from tournament.versioning import PARENT_LOOKUPS, deleted_directly
+
+Actions = models.Change.Actions
+# The columns of the change rows returned to clients.
+CHANGE_FIELDS = ["seq", "action", "model", "id", "data"]
+
+
+def object_data(instance: Model) -> dict:
+    """ The field values of an object as the API represents them, with related objects as ids. """
+    return {
+        field.name: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+        if not field.primary_key
+    }
+
+
+def created_changes(tournament_id: Union[int, Subquery], instances: Iterable[Model]) -> List[models.Change]:
+    """ Changes for objects created in bulk. The tournament can be a subquery, so callers need not look it up. """
+    return [
+        models.Change(
+            tournament_id=tournament_id,
+            action=Actions.Created,
+            model=instance._meta.model_name,
+            object_id=instance.pk,
+            data=object_data(instance),
+        )
+        for instance in instances
+    ]
+
+
+def updated_changes(tournament_id: int, model: Type[Model], pks: Iterable[int], **fields) -> List[models.Change]:
+    """ Changes for a queryset update that set `fields` on the objects with the given primary keys. """
+    data = {name: getattr(value, "pk", value) for name, value in fields.items()}
+    return [
+        models.Change(tournament_id=tournament_id, action=Actions.Updated, model=model._meta.model_name, object_id=pk,
+                      data=data)
+        for pk in pks
+    ]
+
+
+def record(changes: Iterable[models.Change]) -> None:
+    """ Appends changes to the log with one bulk insert. Bulk writes call this, as they send no signals. """
+    models.Change.objects.bulk_create(changes)
+
+
+def changes_since(tournament_id: int, since: int, limit: int) -> QuerySet:
+    """
+    The changes of a tournament after sequence number `since`.
+
+    The sequence number is the autoincrement id, so this relies on SQLite serializing writes: ids become visible in the
+    order they are allocated. On a database with concurrent writers a transaction holding a lower id could commit after
+    a client has read past it, and that change would be skipped.
+    """
+    return models.Change.objects.filter(tournament_id=tournament_id, pk__gt=since).order_by("pk").values_list(
+        "pk", "action", "model", "object_id", "data",
+    )[:limit]
+
+
+@lru_cache(maxsize=None)
+def cascaded_models(model: Type[Model]) -> FrozenSet[Type[Model]]:
+    """ The models whose objects can be deleted along with an object of `model`. """
+    reached, pending = set(), [model]
+    while pending:
+        for relation in pending.pop()._meta.related_objects:
+            if relation.on_delete is CASCADE and relation.related_model not in reached:
+                reached.add(relation.related_model)
+                pending.append(relation.related_model)
+    return frozenset(reached)
+
+
+def feed_parent_model(model: Type[Model]) -> Type[Model]:
+    parent_attribute, _ = PARENT_LOOKUPS[model]
+    return model._meta.get_field(parent_attribute.removesuffix("_id")).related_model
+
+
+def logged_delete(sender: Type[Model], origin) -> bool:
+    """
+    Whether a deleted object goes in the change log. Objects deleted along with their parent in the feed are left
+    out, as clients drop them with the parent. Cascades across the feed's hierarchy are logged, e.g. the teams of a
+    deleted pool, which are listed under their tournament, or the turns of a deleted team, listed under their round.
+    """
+    if deleted_directly(sender, origin):
+        return True
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    parent_model = feed_parent_model(sender)
+    return parent_model is not origin_model and parent_model not in cascaded_models(origin_model)
+
+
+def object_changed(sender, instance, signal, raw: bool = False, created: bool = False, **kwargs):
+    # A deleted tournament takes its change log with it.
+    if raw:
+        return
+    if signal is post_delete:
+        if sender is models.Tournament or not logged_delete(sender, kwargs.get("origin")):
+            return
+        action, data = Actions.Deleted, None
+    else:
+        action, data = Actions.Created if created else Actions.Updated, object_data(instance)
+    parent_attribute, lookup = PARENT_LOOKUPS[sender]
+    parent = getattr(instance, parent_attribute)
+    if lookup == "pk":
+        tournament_id = parent
+    else:
+        tournament_id = Subquery(models.Tournament.objects.filter(**{lookup: parent}).values("pk")[:1])
+    models.Change.objects.create(
+        tournament_id=tournament_id, action=action, model=sender._meta.model_name, object_id=instance.pk, data=data,
+    )
+
+
+for model in PARENT_LOOKUPS:
+    post_save.connect(object_changed, sender=model, dispatch_uid=f"change-save-{model.__name__}")
+    post_delete.connect(object_changed, sender=model, dispatch_uid=f"change-delete-{model.__name__}")
@@ -0,0 +1,83 @@
+import csv
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List
+
+from django.db.models import F
+
+from tournament import models
+
+CSV_FORMAT = "csv"
+NDJSON_FORMAT = "ndjson"
+CONTENT_TYPES = {
+    CSV_FORMAT: "text/csv",
+    NDJSON_FORMAT: "application/x-ndjson",
+}
+
+EXPORT_FIELDS = [
+    "pool", "pool_type", "round", "round_number", "turn", "turn_order", "team", "participants",
+    "form", "score", "technique_score", "presentation_score",
+]
+ITERATOR_CHUNK_SIZE = 2000
+
+
+def team_participant_names(tournament: models.Tournament) -> Dict[int, List[str]]:
+    names = defaultdict(list)
+    participants = models.Participant.objects.filter(team__tournament=tournament).order_by("team_id", "pk")
+    for team_id, name in participants.values_list("team_id", "name").iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        names[team_id].append(name)
+    return names
+
+
+def result_rows(tournament: models.Tournament) -> Iterator[dict]:
+    """
+    Yields one row per score of the tournament, in pool, round, turn and form order.
+
+    Scores are read from a single joined query through a server-side iterator; participant names are loaded once per
+    team beforehand, so no queries are issued per row.
+    """
+    participant_names = team_participant_names(tournament)
+    scores = models.Score.objects.filter(form__turn__round__pool__tournament=tournament).order_by(
+        "form__turn__round__pool_id", "form__turn__round__round_number", "form__turn__turn_order", "form_id", "pk",
+    ).values(
+        "form",
+        "technique_score",
+        "presentation_score",
+        score=F("pk"),
+        turn=F("form__turn_id"),
+        turn_order=F("form__turn__turn_order"),
+        team=F("form__turn__team_id"),
+        round=F("form__turn__round_id"),
+        round_number=F("form__turn__round__round_number"),
+        pool=F("form__turn__round__pool_id"),
+        pool_type=F("form__turn__round__pool__pool_type"),
+    )
+    for score in scores.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        score["participants"] = participant_names.get(score["team"], [])
+        yield {name: score[name] for name in EXPORT_FIELDS}
+
+
+class _EchoBuffer:
+    """ A file-like object that hands written values back instead of storing them, for streaming `csv.writer`. """
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv(rows: Iterable[dict]) -> Iterator[str]:
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row["participants"] = " & ".join(row["participants"])
+        yield writer.writerow([row[name] for name in EXPORT_FIELDS])
+
+
+def stream_ndjson(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, separators=(",", ":")) + "\n"
+
+
+STREAMERS = {
+    CSV_FORMAT: stream_csv,
+    NDJSON_FORMAT: stream_ndjson,
+}
+EXPORT_FORMATS = list(STREAMERS)
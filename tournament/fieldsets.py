@@ -0,0 +1,141 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from tournament.profiling import TimedRepresentationMixin, allow_extra_queries
+
+PathTree = Dict[str, "PathTree"]
+
+SERIALIZERS_BY_MODEL: Dict[type, type] = {}
+
+
+def parse_paths(values: Iterable[str]) -> PathTree:
+    """ Parses comma separated, dotted paths like "id,teams.participants" into a tree of names. """
+    tree: PathTree = {}
+    for value in values:
+        for path in value.split(","):
+            path = path.strip()
+            if not path:
+                continue
+            node = tree
+            for name in path.split("."):
+                node = node.setdefault(name, {})
+    return tree
+
+
+def relation_of(model, name: str):
+    """ The model field for `name` if it is a relation, otherwise None. """
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+class SparseFieldsetSerializerMixin(TimedRepresentationMixin):
+    """
+    Lets model serializers return only the `fields` the client asked for, and `expand` relations into nested objects.
+
+    Both are trees from `parse_paths`; a relation expands into the sparse serializer registered for its model, and
+    the subtrees of an expanded relation apply to the nested serializer.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        SERIALIZERS_BY_MODEL.setdefault(cls.Meta.model, cls)
+
+    def __init__(self, *args, fields: Optional[PathTree] = None, expand: Optional[PathTree] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name, subtree in (expand or {}).items():
+            if name not in self.fields:
+                continue
+            field = relation_of(self.Meta.model, name)
+            self.fields[name] = SERIALIZERS_BY_MODEL[field.related_model](
+                many=field.one_to_many or field.many_to_many,
+                read_only=True,
+                fields=(fields or {}).get(name) or None,
+                expand=subtree,
+            )
+
+    @classmethod
+    def check_paths(cls, fields: Optional[PathTree], expand: Optional[PathTree], prefix: str = ""):
+        names = set(cls.Meta.fields)
+        unknown = [prefix + name for name in (fields or {}) if name not in names]
+        for name, subtree in (expand or {}).items():
+            field = relation_of(cls.Meta.model, name)
+            if name not in names or field is None or field.related_model not in SERIALIZERS_BY_MODEL:
+                unknown.append(prefix + name)
+                continue
+            SERIALIZERS_BY_MODEL[field.related_model].check_paths(
+                (fields or {}).get(name) or None, subtree, f"{prefix}{name}.",
+            )
+        if unknown:
+            raise ValidationError({"detail": f"Unknown or unexpandable fields: {', '.join(unknown)}."})
+
+    @classmethod
+    def related_lookups(
+            cls, fields: Optional[PathTree], expand: Optional[PathTree], prefix: str = "", prefetched: bool = False,
+    ) -> Tuple[List[str], List]:
+        """
+        The `select_related` and `prefetch_related` arguments needed to serialize the requested fields in a fixed
+        number of queries. Reverse relations that are not requested are not looked up at all, and those that are
+        requested without expanding them only load their primary keys.
+        """
+        select_related, prefetch_related = [], []
+        expand = expand or {}
+        for name in cls.Meta.fields:
+            if fields and name not in fields:
+                continue
+            field = relation_of(cls.Meta.model, name)
+            if field is None:
+                continue
+            path = prefix + name
+            many = field.one_to_many or field.many_to_many
+            if name in expand:
+                # Forward relations are joined, unless they hang below a relation that is prefetched anyway.
+                (prefetch_related if many or prefetched else select_related).append(path)
+                nested_select, nested_prefetch = SERIALIZERS_BY_MODEL[field.related_model].related_lookups(
+                    (fields or {}).get(name) or None, expand[name], f"{path}__", prefetched or many,
+                )
+                select_related.extend(nested_select)
+                prefetch_related.extend(nested_prefetch)
+            elif many:
+                related_model = field.related_model
+                prefetch_related.append(Prefetch(path, queryset=related_model.objects.only(
+                    related_model._meta.pk.name, field.field.name,
+                )))
+        return select_related, prefetch_related
+
+
+class SparseFieldsetViewMixin:
+    """
+    Reads `?fields=` and `?expand=` on safe requests, and loads the related objects they need up front. The declared
+    `query_budget` of the view excludes these lookups, as it grows by one query per prefetched relation.
+    """
+
+    def get_paths(self) -> Tuple[Optional[PathTree], Optional[PathTree]]:
+        if self.request.method not in SAFE_METHODS:
+            return None, None
+        fields = parse_paths(self.request.query_params.getlist("fields")) or None
+        expand = parse_paths(self.request.query_params.getlist("expand")) or None
+        self.get_serializer_class().check_paths(fields, expand)
+        return fields, expand
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, expand = self.get_paths()
+        select_related, prefetch_related = self.get_serializer_class().related_lookups(fields, expand)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        allow_extra_queries(len(prefetch_related))
+        return queryset.prefetch_related(*prefetch_related)
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_paths()
+        return super().get_serializer(*args, fields=fields, expand=expand, **kwargs)
@@ -0,0 +1,17 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class RelationFilterBackend(BaseFilterBackend):
+    """ Filters a list view by the related ids named in its `filter_fields`, e.g. `scores/?round=3`. """
+
+    def filter_queryset(self, request, queryset, view):
+        lookups = {}
+        for param, lookup in getattr(view, "filter_fields", {}).items():
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            if not value.isdigit():
+                raise ValidationError({param: f"Expected an id, got {value!r}."})
+            lookups[lookup] = int(value)
+        return queryset.filter(**lookups)
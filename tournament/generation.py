@@ -0,0 +1,82 @@
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List
+
+from django.db import transaction
+from django.utils import timezone
+
+from tournament import models
+from tournament.changes import created_changes, record
+from tournament.registration import register_teams
+from tournament.schedule import make_first_rounds
+from tournament.standings import rebuild_standings
+from tournament.versioning import single_version_bump
+
+BELT_GRADE_CODES = [grade for grade, _ in models.Participant.BELT_GRADES]
+SEX_CODES = [sex for sex, _ in models.Participant.SEXES]
+# Most signups are solo, some pairs and a few teams of three.
+TEAM_SIZES = [1, 2, 3]
+TEAM_SIZE_WEIGHTS = [0.75, 0.15, 0.10]
+# Lower belts are more common than dan grades.
+BELT_GRADE_WEIGHTS = [15, 12, 11, 10, 9, 8, 7, 6, 5, 5, 4, 3, 2, 2, 1]
+
+
+@dataclass
+class GenerationParameters:
+    teams: int = 100
+    judges: int = 5
+    forms_per_turn: int = 2
+    min_age: int = 6
+    max_age: int = 70
+    seed: int = 0
+
+
+def random_participant(rng: random.Random, tournament_start: date, parameters: GenerationParameters) -> dict:
+    age_days = rng.randint(parameters.min_age * 365, parameters.max_age * 365)
+    return {
+        "name": f"Participant {rng.randrange(10 ** 6):06d}",
+        "belt_grade": rng.choices(BELT_GRADE_CODES, BELT_GRADE_WEIGHTS)[0],
+        "sex": rng.choice(SEX_CODES),
+        "birthdate": tournament_start - timedelta(days=age_days),
+    }
+
+
+def generate_tournament(parameters: GenerationParameters, name: str = "Generated tournament") -> models.Tournament:
+    """ Creates a tournament with `parameters.teams` teams of randomly chosen sizes, belts, sexes and ages. """
+    rng = random.Random(parameters.seed)
+    tournament = models.Tournament.objects.create(name=name[:32], tournament_start=timezone.now())
+    start = tournament.tournament_start.date()
+    teams = [
+        {
+            "participants": [
+                random_participant(rng, start, parameters)
+                for _ in range(rng.choices(TEAM_SIZES, TEAM_SIZE_WEIGHTS)[0])
+            ]
+        }
+        for _ in range(parameters.teams)
+    ]
+    register_teams(tournament, teams)
+    return tournament
+
+
+def generate_results(tournament: models.Tournament, parameters: GenerationParameters) -> List[models.Round]:
+    """
+    Creates a first round for every pool of the tournament, with a turn per team, `forms_per_turn` forms per turn
+    and a score per judge per form. Pools must have been made already.
+    """
+    rng = random.Random(parameters.seed)
+    scheduled = make_first_rounds(tournament)
+    rounds = [round_obj for round_obj, _ in scheduled]
+    with transaction.atomic(), single_version_bump(pk=tournament.pk):
+        forms = models.Form.objects.bulk_create([
+            models.Form(turn=turn) for _, turns in scheduled for turn in turns for _ in range(parameters.forms_per_turn)
+        ])
+        scores = models.Score.objects.bulk_create([
+            models.Score(form=form, technique_score=rng.randint(0, 10), presentation_score=rng.randint(0, 10))
+            for form in forms
+            for _ in range(parameters.judges)
+        ], batch_size=1000)
+        record(created_changes(tournament.pk, forms) + created_changes(tournament.pk, scores))
+        rebuild_standings(round_obj.pk for round_obj in rounds)
+    return rounds
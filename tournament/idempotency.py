@@ -0,0 +1,28 @@
+import hashlib
+import json
+from datetime import timedelta
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from tournament import models
+
+
+def operation_hash(operation: dict) -> str:
+    """ A fingerprint of an operation, telling a retry apart from a different operation that reuses its key. """
+    encoded = json.dumps(operation, sort_keys=True, separators=(",", ":"), cls=DjangoJSONEncoder)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def purge_expired_keys() -> None:
+    """ Deletes the keys older than `TOURNAMENT_IDEMPOTENCY_KEY_SECONDS` with one range delete on their index. """
+    cutoff = timezone.now() - timedelta(seconds=settings.TOURNAMENT_IDEMPOTENCY_KEY_SECONDS)
+    models.IdempotencyKey.objects.filter(created__lt=cutoff).delete()
+
+
+def stored_keys(user: AbstractBaseUser, keys: Iterable[str]) -> Dict[str, models.IdempotencyKey]:
+    """ The keys a user stored before. Other users' keys are never replayed, even when they are equal. """
+    return {stored.key: stored for stored in models.IdempotencyKey.objects.filter(user=user, key__in=list(keys))}
@@ -0,0 +1,191 @@
+import csv
+import itertools
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from tournament import models
+from tournament.registration import register_teams
+from tournament.rules import DEFAULT_RULESET, CompiledRuleset, tournament_ruleset
+
+logger = logging.getLogger(__name__)
+
+CSV_FORMAT = "csv"
+NDJSON_FORMAT = "ndjson"
+IMPORT_FORMATS = [CSV_FORMAT, NDJSON_FORMAT]
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+BELT_GRADE_CODES = frozenset(grade for grade, _ in models.Participant.BELT_GRADES)
+SEX_CODES = frozenset(sex for sex, _ in models.Participant.SEXES)
+
+
+@dataclass
+class ImportRow:
+    """ One parsed participant row. Rows with the same team key on consecutive rows form a team. """
+    row: int
+    team_key: str
+    participant: dict
+    errors: List[str]
+
+
+@dataclass
+class ImportTeam:
+    rows: List[int]
+    participants: List[dict]
+    errors: List[str]
+
+
+@dataclass
+class ImportProgress:
+    chunks: int = 0
+    teams: int = 0
+    participants: int = 0
+    rejected_teams: int = 0
+    errors: List[dict] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "chunks": self.chunks,
+            "teams": self.teams,
+            "participants": self.participants,
+            "rejected_teams": self.rejected_teams,
+            "errors": self.errors,
+        }
+
+
+class ImportFailed(ValueError):
+    """ A file that could not be read at `line`. The teams counted in `progress` were imported before it. """
+
+    def __init__(self, line: Optional[int], message: str, progress: Optional[ImportProgress] = None):
+        super().__init__(message if line is None else f"line {line}: {message}")
+        self.line = line
+        self.progress = progress
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[dict]:
+    reader = csv.DictReader(lines)
+    try:
+        yield from reader
+    except csv.Error as error:
+        raise ImportFailed(reader.line_num, str(error)) from error
+
+
+def parse_ndjson(lines: Iterable[str]) -> Iterator[dict]:
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise ImportFailed(line_number, str(error)) from error
+
+
+PARSERS: Dict[str, Callable[[Iterable[str]], Iterator[dict]]] = {
+    CSV_FORMAT: parse_csv,
+    NDJSON_FORMAT: parse_ndjson,
+}
+
+
+def validate_row(row_number: int, record: dict, ruleset: CompiledRuleset = DEFAULT_RULESET) -> ImportRow:
+    if not isinstance(record, dict):
+        return ImportRow(row=row_number, team_key="", participant={}, errors=["row must be an object."])
+    errors = []
+    name = str(record.get("name") or "").strip()
+    if not name or len(name) > 128:
+        errors.append("name must be between 1 and 128 characters.")
+    belt_grade = record.get("belt_grade")
+    if belt_grade not in BELT_GRADE_CODES:
+        errors.append(f"belt_grade {belt_grade!r} not one of: {sorted(BELT_GRADE_CODES)}.")
+    elif not ruleset.allows(belt_grade):
+        errors.append(f"belt_grade {belt_grade!r} is not allowed by the tournament's ruleset.")
+    sex = record.get("sex")
+    if sex not in SEX_CODES:
+        errors.append(f"sex {sex!r} not one of: {sorted(SEX_CODES)}.")
+    birthdate = None
+    try:
+        birthdate = date.fromisoformat(str(record.get("birthdate")))
+    except ValueError:
+        errors.append(f"birthdate {record.get('birthdate')!r} is not a YYYY-MM-DD date.")
+    team_key = str(record.get("team") or "").strip()
+    if not team_key:
+        errors.append("team must not be empty.")
+    return ImportRow(
+        row=row_number,
+        team_key=team_key,
+        participant={"name": name, "belt_grade": belt_grade, "sex": sex, "birthdate": birthdate},
+        errors=errors,
+    )
+
+
+def validate_rows(records: Iterable[dict], ruleset: CompiledRuleset = DEFAULT_RULESET) -> Iterator[ImportRow]:
+    for row_number, record in enumerate(records, start=1):
+        yield validate_row(row_number, record, ruleset)
+
+
+def group_teams(rows: Iterable[ImportRow]) -> Iterator[ImportTeam]:
+    """ Groups consecutive rows that share a team key. A single invalid row rejects its whole team. """
+    for _, team_rows in itertools.groupby(rows, key=lambda row: row.team_key):
+        team = ImportTeam(rows=[], participants=[], errors=[])
+        for row in team_rows:
+            team.rows.append(row.row)
+            team.participants.append(row.participant)
+            team.errors.extend(f"row {row.row}: {error}" for error in row.errors)
+        yield team
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def import_registrations(
+        tournament: models.Tournament,
+        lines: Iterable[str],
+        file_format: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        on_progress: Optional[Callable[[ImportProgress], None]] = None,
+) -> ImportProgress:
+    """
+    Streams registration rows into a tournament.
+
+    Rows are parsed, validated and grouped lazily, and teams are written in chunks of `chunk_size`, each in its own
+    transaction, so memory use does not grow with the size of the input. Rows of one team must be on consecutive
+    lines. A line that cannot be read raises `ImportFailed`, whose progress counts the teams already imported.
+    """
+    if file_format not in PARSERS:
+        raise ValueError(f"Format {file_format} not one of: {IMPORT_FORMATS}.")
+    progress = ImportProgress()
+    teams = group_teams(validate_rows(PARSERS[file_format](lines), tournament_ruleset(tournament.pk)))
+    try:
+        for chunk in chunked(teams, chunk_size):
+            import_chunk(tournament, chunk, progress)
+            if on_progress is not None:
+                on_progress(progress)
+    except ImportFailed as error:
+        error.progress = progress
+        raise
+    except UnicodeDecodeError as error:
+        raise ImportFailed(None, str(error), progress) from error
+    return progress
+
+
+def import_chunk(tournament: models.Tournament, chunk: List[ImportTeam], progress: ImportProgress) -> None:
+    valid_teams = []
+    for team in chunk:
+        if team.errors:
+            progress.rejected_teams += 1
+            if len(progress.errors) < MAX_REPORTED_ERRORS:
+                progress.errors.append({"rows": team.rows, "errors": team.errors})
+        else:
+            valid_teams.append({"participants": team.participants})
+    register_teams(tournament, valid_teams)
+    progress.chunks += 1
+    progress.teams += len(valid_teams)
+    progress.participants += sum(len(team["participants"]) for team in valid_teams)
+    logger.info("Imported chunk %d into tournament %d: %d teams so far.", progress.chunks, tournament.pk,
+                progress.teams)
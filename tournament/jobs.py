@@ -0,0 +1,95 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from tournament import models
+from tournament.rules import make_pools, split_tournament_pools
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.TOURNAMENT_JOB_WORKERS, thread_name_prefix="pool-job")
+    return _executor
+
+
+def update_job(job_id: int, **fields):
+    fields["updated"] = timezone.now()
+    models.PoolJob.objects.filter(pk=job_id).update(**fields)
+
+
+def run_pool_job(job_id: int):
+    """ Makes (and optionally splits) the pools of a job's tournament, recording progress on the job. """
+    try:
+        job = models.PoolJob.objects.select_related("tournament").get(pk=job_id)
+        update_job(job_id, status=models.PoolJob.Statuses.Running, progress=10)
+        unassigned = make_pools(job.tournament)
+        update_job(job_id, progress=70)
+        split_tournament_pools(job.tournament, job.max_pool_size)
+        update_job(
+            job_id,
+            status=models.PoolJob.Statuses.Succeeded,
+            progress=100,
+            finished=timezone.now(),
+            result={
+                "pools": job.tournament.pools.count(),
+                "teams": job.tournament.teams.filter(pool__isnull=False).count(),
+                "unassigned_teams": unassigned,
+            },
+        )
+    except Exception as error:
+        logger.exception("Pool job %d failed.", job_id)
+        update_job(job_id, status=models.PoolJob.Statuses.Failed, error=str(error), finished=timezone.now())
+    finally:
+        if not settings.TOURNAMENT_JOBS_EAGER:
+            close_old_connections()
+
+
+def start_job(job_id: int):
+    if settings.TOURNAMENT_JOBS_EAGER:
+        run_pool_job(job_id)
+    else:
+        executor().submit(run_pool_job, job_id)
+
+
+def expire_abandoned_jobs(tournament: models.Tournament):
+    """ Fails active jobs that stopped reporting progress, e.g. because their process was restarted. """
+    cutoff = timezone.now() - timedelta(seconds=settings.TOURNAMENT_JOB_TIMEOUT)
+    models.PoolJob.objects.filter(
+        tournament=tournament, status__in=models.PoolJob.ACTIVE_STATUSES, updated__lt=cutoff,
+    ).update(status=models.PoolJob.Statuses.Failed, error="Abandoned.", finished=timezone.now())
+
+
+def active_pool_job(tournament: models.Tournament) -> Optional[models.PoolJob]:
+    """ The queued or running job of a tournament, if any. Call it holding the tournament's row lock. """
+    expire_abandoned_jobs(tournament)
+    return models.PoolJob.objects.filter(tournament=tournament, status__in=models.PoolJob.ACTIVE_STATUSES).first()
+
+
+def submit_pool_job(tournament: models.Tournament, max_pool_size: Optional[int]) -> Tuple[models.PoolJob, bool]:
+    """
+    Queues pool creation for a tournament, unless a job for it is already queued or running. Returns the job and
+    whether it was created. The job starts once the submitting transaction commits.
+    """
+    with transaction.atomic():
+        list(models.Tournament.objects.select_for_update().filter(pk=tournament.pk))
+        active = active_pool_job(tournament)
+        if active is not None:
+            return active, False
+        try:
+            with transaction.atomic():
+                job = models.PoolJob.objects.create(tournament=tournament, max_pool_size=max_pool_size)
+        except IntegrityError:
+            # Another request queued a job between the check and the insert.
+            return models.PoolJob.objects.get(tournament=tournament, status__in=models.PoolJob.ACTIVE_STATUSES), False
+        transaction.on_commit(lambda: start_job(job.pk))
+    return job, True
@@ -0,0 +1,112 @@
+from typing import Optional
+
+from django.db.models import (
+    Case, Count, F, FloatField, IntegerField, Max, Min, OuterRef, QuerySet, Subquery, Sum, Value, When, Window,
+)
+from django.db.models.functions import Cast, Coalesce, Rank, Round
+
+from tournament import models
+
+JUDGE_TOTAL = F("technique_score") + F("presentation_score")
+# Trimmed scores are rounded so that float noise from the per-form means does not break ties.
+TRIMMED_SCORE_PRECISION = 4
+
+
+class SubquerySum(Subquery):
+    """ Sums the `trimmed_mean` column over all rows of a subquery, e.g. over the grouped forms of a turn. """
+    template = "(SELECT SUM(trimmed_mean) FROM (%(subquery)s) trimmed_forms)"
+    output_field = FloatField()
+
+
+def trimmed_form_means(**score_filter) -> QuerySet:
+    """
+    The trimmed mean of the judge totals of every form whose scores match `score_filter`. The highest and lowest judge
+    total are dropped for forms with at least three scores.
+    """
+    return models.Score.objects.filter(**score_filter).values("form").annotate(
+        judges=Count("pk"),
+        judge_sum=Sum(JUDGE_TOTAL),
+        judge_max=Max(JUDGE_TOTAL),
+        judge_min=Min(JUDGE_TOTAL),
+    ).annotate(
+        trimmed_mean=Case(
+            When(
+                judges__gte=3,
+                then=Cast(F("judge_sum") - F("judge_max") - F("judge_min"), FloatField()) / (F("judges") - 2),
+            ),
+            default=Cast(F("judge_sum"), FloatField()) / F("judges"),
+        ),
+    ).values("trimmed_mean")
+
+
+def score_annotations(score_prefix: str, trimmed: SubquerySum) -> dict:
+    """ The score count, the total score and the rounded trimmed score of rows whose scores are at `score_prefix`. """
+    return {
+        "score_count": Count(f"{score_prefix}__pk"),
+        "total_score": Coalesce(
+            Sum(F(f"{score_prefix}__technique_score") + F(f"{score_prefix}__presentation_score")),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+        "trimmed_score": Round(Coalesce(trimmed, Value(0.0)), TRIMMED_SCORE_PRECISION),
+    }
+
+
+def ranked(queryset: QuerySet, score_prefix: str, trimmed: SubquerySum, top: int, partition_by=None) -> QuerySet:
+    """
+    Annotates score totals, the trimmed score and the rank, and keeps the rows ranked `top` or better, all in one
+    query. Rows rank by trimmed score, then by total score; rows equal on both share a rank.
+    """
+    return queryset.annotate(
+        **score_annotations(score_prefix, trimmed),
+        rank=Window(
+            Rank(),
+            partition_by=partition_by,
+            order_by=[F("trimmed_score").desc(), F("total_score").desc()],
+        ),
+    ).filter(rank__lte=top)
+
+
+def turn_scores(turns: QuerySet) -> QuerySet:
+    """ Annotates turns with the scores their leaderboards rank them by. """
+    return turns.annotate(
+        **score_annotations("forms__scores", SubquerySum(trimmed_form_means(form__turn=OuterRef("pk")))),
+    )
+
+
+def turn_leaderboard(turns: QuerySet, top: int) -> QuerySet:
+    # Ties share a rank and are listed in turn order, the order in which advance_rounds breaks them.
+    return ranked(
+        turns, "forms__scores", SubquerySum(trimmed_form_means(form__turn=OuterRef("pk"))), top,
+    ).order_by("rank", "turn_order").values(
+        "rank", "team", "turn_order", "score_count", "total_score", "trimmed_score", turn=F("pk"),
+    )
+
+
+def round_leaderboard(round_id: int, top: int) -> QuerySet:
+    return turn_leaderboard(models.Turn.objects.filter(round_id=round_id), top)
+
+
+def pool_leaderboard(pool_id: int, top: int) -> QuerySet:
+    """ The leaderboard of the latest round of a pool. """
+    latest_round = models.Round.objects.filter(pool_id=pool_id).order_by("-round_number").values("pk")[:1]
+    return turn_leaderboard(models.Turn.objects.filter(round__pool_id=pool_id, round=latest_round), top)
+
+
+def class_leaderboard(tournament_id: int, class_level: int, top: int, pool_type: Optional[str] = None) -> QuerySet:
+    """
+    Ranks the teams of all pools of a competition class by their scores summed over all rounds. Solo, pair and team
+    pools are ranked separately.
+    """
+    teams = models.Team.objects.filter(tournament_id=tournament_id, pool__class_level=class_level)
+    if pool_type is not None:
+        teams = teams.filter(pool__pool_type=pool_type)
+    return ranked(
+        teams,
+        "turn__forms__scores",
+        SubquerySum(trimmed_form_means(form__turn__team=OuterRef("pk"))),
+        top,
+        partition_by=F("pool__pool_type"),
+    ).order_by("pool__pool_type", "rank", "pk").values(
+        "rank", "pool", "score_count", "total_score", "trimmed_score", team=F("pk"), pool_type=F("pool__pool_type"),
+    )
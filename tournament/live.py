@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tournament import models
+
+MAX_PENDING_MESSAGES = 256
+KEEPALIVE_SECONDS = 15
+# Django 4.2 does not notice ASGI clients disconnecting, so streams end on their own and clients reconnect.
+MAX_STREAM_SECONDS = 300
+
+
+def tournament_channel(tournament_id: int) -> str:
+    return f"tournament:{tournament_id}"
+
+
+def pool_channel(pool_id: int) -> str:
+    return f"pool:{pool_id}"
+
+
+class Subscription:
+    """ A subscriber's queue of encoded messages, bound to the event loop that consumes it. """
+    def __init__(self, broker: "Broker", channels: Iterable[str], loop: asyncio.AbstractEventLoop):
+        self.broker = broker
+        self.channels = list(channels)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_MESSAGES)
+
+    def deliver(self, message: str):
+        # Runs on the subscriber's loop. A slow subscriber loses its oldest messages instead of blocking publishers.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """
+    In-process publish/subscribe for live updates.
+
+    Messages are encoded once per publish and handed to every subscriber's event loop, so one write reaches any
+    number of subscribers without them touching the database. Only subscribers in the same process receive messages.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+
+    def subscribe(self, channels: Iterable[str], loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        subscription = Subscription(self, channels, loop or asyncio.get_running_loop())
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def publish(self, channels: Iterable[str], message: dict):
+        encoded = json.dumps(message, separators=(",", ":"))
+        with self._lock:
+            subscriptions = set().union(*(self._subscriptions.get(channel, ()) for channel in channels))
+        for subscription in subscriptions:
+            if subscription.loop.is_closed():
+                # Its stream can no longer run, so nothing else would ever unsubscribe it.
+                self.unsubscribe(subscription)
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, encoded)
+            except RuntimeError:
+                # The loop closed since the check above.
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+def publish_on_commit(tournament_id: int, pool_id: int, message: dict):
+    channels = [tournament_channel(tournament_id), pool_channel(pool_id)]
+    transaction.on_commit(lambda: broker.publish(channels, message))
+
+
+@receiver(post_save, sender=models.Score)
+@receiver(post_delete, sender=models.Score)
+def score_changed(sender, instance: models.Score, signal, raw: bool = False, **kwargs):
+    if raw or not broker.has_subscribers():
+        return
+    location = models.Form.objects.filter(pk=instance.form_id).values_list(
+        "turn_id", "turn__round__pool_id", "turn__round__pool__tournament_id",
+    ).first()
+    if location is None:
+        return
+    turn_id, pool_id, tournament_id = location
+    publish_on_commit(tournament_id, pool_id, {
+        "type": "score",
+        "action": "deleted" if signal is post_delete else "saved",
+        "id": instance.pk,
+        "form": instance.form_id,
+        "turn": turn_id,
+        "technique_score": instance.technique_score,
+        "presentation_score": instance.presentation_score,
+    })
+
+
+def turn_message(turn: models.Turn, action: str) -> dict:
+    return {
+        "type": "turn",
+        "action": action,
+        "id": turn.pk,
+        "round": turn.round_id,
+        "turn_order": turn.turn_order,
+        "team": turn.team_id,
+    }
+
+
+@receiver(post_save, sender=models.Turn)
+@receiver(post_delete, sender=models.Turn)
+def turn_changed(sender, instance: models.Turn, signal, raw: bool = False, **kwargs):
+    if raw or not broker.has_subscribers():
+        return
+    location = models.Round.objects.filter(pk=instance.round_id).values_list("pool_id", "pool__tournament_id").first()
+    if location is None:
+        return
+    pool_id, tournament_id = location
+    publish_on_commit(tournament_id, pool_id, turn_message(instance, "deleted" if signal is post_delete else "saved"))
+
+
+def publish_created_turns(tournament_id: int, rounds: Iterable[Tuple[models.Round, List[models.Turn]]]):
+    """ Publishes the turns of rounds created in bulk, which send no signals, once the transaction commits. """
+    if not broker.has_subscribers():
+        return
+    for round_obj, turns in rounds:
+        for turn in turns:
+            publish_on_commit(tournament_id, round_obj.pool_id, turn_message(turn, "saved"))
+
+
+async def event_stream(channels: Iterable[str], max_seconds: float = MAX_STREAM_SECONDS):
+    """
+    Subscribes once the response starts streaming, so a client that never reads leaves no subscription behind.
+
+    The stream ends after `max_seconds`, so a subscription outlives a disconnected client by at most that long.
+    """
+    subscription = None
+    try:
+        subscription = broker.subscribe(channels)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_seconds
+        yield "retry: 3000\n\n"
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                message = await asyncio.wait_for(subscription.get(), min(KEEPALIVE_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+            else:
+                yield f"data: {message}\n\n"
+    finally:
+        if subscription is not None:
+            subscription.close()
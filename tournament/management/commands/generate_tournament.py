@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from tournament.generation import GenerationParameters, generate_results, generate_tournament
+from tournament.rules import make_pools
+
+
+class Command(BaseCommand):
+    help = "Generates a synthetic tournament with random teams, and optionally pools, rounds and scores."
+
+    def add_arguments(self, parser):
+        defaults = GenerationParameters()
+        parser.add_argument("--teams", type=int, default=defaults.teams)
+        parser.add_argument("--judges", type=int, default=defaults.judges)
+        parser.add_argument("--forms-per-turn", type=int, default=defaults.forms_per_turn)
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument("--name", default="Generated tournament")
+        parser.add_argument("--with-results", action="store_true", help="Also make pools, a round and scores.")
+
+    def handle(self, *args, **options):
+        parameters = GenerationParameters(
+            teams=options["teams"],
+            judges=options["judges"],
+            forms_per_turn=options["forms_per_turn"],
+            seed=options["seed"],
+        )
+        tournament = generate_tournament(parameters, name=options["name"])
+        if options["with_results"]:
+            make_pools(tournament)
+            generate_results(tournament, parameters)
+        self.stdout.write(self.style.SUCCESS(f"Generated tournament {tournament}."))
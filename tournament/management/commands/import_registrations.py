@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tournament import models
+from tournament.importing import DEFAULT_CHUNK_SIZE, IMPORT_FORMATS, ImportProgress, import_registrations
+
+
+class Command(BaseCommand):
+    help = "Streams registrations from a CSV or NDJSON file into a tournament."
+
+    def add_arguments(self, parser):
+        parser.add_argument("tournament_id", type=int)
+        parser.add_argument("path", type=Path)
+        parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            tournament = models.Tournament.objects.get(id=options["tournament_id"])
+        except models.Tournament.DoesNotExist:
+            raise CommandError(f"Tournament {options['tournament_id']} does not exist.")
+        path: Path = options["path"]
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(f"Format {file_format} not one of: {IMPORT_FORMATS}.")
+
+        def report(progress: ImportProgress):
+            self.stdout.write(
+                f"Chunk {progress.chunks}: {progress.teams} teams, {progress.participants} participants, "
+                f"{progress.rejected_teams} rejected teams."
+            )
+
+        with path.open(newline="", encoding="utf-8") as file:
+            try:
+                progress = import_registrations(tournament, file, file_format, options["chunk_size"], report)
+            except ValueError as error:
+                raise CommandError(f"Could not read {path}: {error}")
+        for error in progress.errors:
+            self.stderr.write(f"Rejected rows {error['rows']}: {'; '.join(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(f"Imported {progress.teams} teams into {tournament}."))
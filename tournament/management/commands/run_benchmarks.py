@@ -0,0 +1,43 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from tournament.benchmarks import run_benchmarks
+from tournament.generation import GenerationParameters
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the API against a generated tournament in a disposable test database and writes JSON results."
+
+    def add_arguments(self, parser):
+        defaults = GenerationParameters()
+        parser.add_argument("--teams", type=int, default=1000)
+        parser.add_argument("--judges", type=int, default=defaults.judges)
+        parser.add_argument("--forms-per-turn", type=int, default=defaults.forms_per_turn)
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument("--output", type=Path, help="JSON file to write; printed to stdout when omitted.")
+
+    def handle(self, *args, **options):
+        parameters = GenerationParameters(
+            teams=options["teams"],
+            judges=options["judges"],
+            forms_per_turn=options["forms_per_turn"],
+            seed=options["seed"],
+        )
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = run_benchmarks(parameters)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            options["output"].write_text(output + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote benchmark results to {options['output']}."))
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,118 @@
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count
+
+from tournament import models
+
+
+@dataclass
+class TimeEstimate:
+    """ How long a turn takes: its forms plus the changeover to the next turn. """
+    forms_per_turn: int = 2
+    seconds_per_form: int = 90
+    seconds_between_turns: int = 30
+
+    def turn_seconds(self) -> int:
+        return self.forms_per_turn * self.seconds_per_form + self.seconds_between_turns
+
+
+def pool_durations(tournament: models.Tournament, estimate: TimeEstimate) -> Dict[int, timedelta]:
+    """ Estimates every pool's duration from its scheduled turns, or from its teams when it has no rounds yet. """
+    pools = tournament.pools.annotate(
+        turn_count=Count("rounds__turns", distinct=True),
+        team_count=Count("teams", distinct=True),
+    ).values_list("pk", "turn_count", "team_count")
+    return {
+        pool_id: timedelta(seconds=(turn_count or team_count) * estimate.turn_seconds())
+        for pool_id, turn_count, team_count in pools
+    }
+
+
+def longest_processing_time(
+        durations: Dict[int, timedelta],
+        mats_available: List[Tuple[datetime, int]],
+) -> Dict[int, Tuple[int, datetime, datetime]]:
+    """
+    Assigns pools to mats with the longest-processing-time heuristic: the longest remaining pool goes to the mat that
+    frees up first, found with a heap of (available time, mat). Returns (mat, start, end) per pool.
+    """
+    heap = list(mats_available)
+    heapq.heapify(heap)
+    slots = {}
+    for pool_id in sorted(durations, key=lambda pk: (-durations[pk], pk)):
+        start, mat = heapq.heappop(heap)
+        end = start + durations[pool_id]
+        slots[pool_id] = (mat, start, end)
+        heapq.heappush(heap, (end, mat))
+    return slots
+
+
+def save_slots(
+        tournament: models.Tournament,
+        slots: Dict[int, Tuple[int, datetime, datetime]],
+        keep: List[models.MatAssignment],
+) -> List[models.MatAssignment]:
+    """ Replaces all of a tournament's assignments except `keep` with new ones for `slots`. """
+    assignments = [
+        models.MatAssignment(tournament=tournament, pool_id=pool_id, mat=mat, start=start, end=end)
+        for pool_id, (mat, start, end) in slots.items()
+    ]
+    with transaction.atomic():
+        models.MatAssignment.objects.filter(tournament=tournament).exclude(pk__in=[a.pk for a in keep]).delete()
+        models.MatAssignment.objects.bulk_create(assignments)
+    return sorted(keep + assignments, key=lambda assignment: (assignment.mat, assignment.start))
+
+
+def plan_mats(tournament: models.Tournament, mats: int, estimate: TimeEstimate) -> List[models.MatAssignment]:
+    """ Plans every pool of the tournament on `mats` mats from the tournament start, replacing any earlier plan. """
+    if mats < 1:
+        raise ValueError("At least one mat is needed.")
+    durations = pool_durations(tournament, estimate)
+    slots = longest_processing_time(durations, [(tournament.tournament_start, mat) for mat in range(1, mats + 1)])
+    return save_slots(tournament, slots, keep=[])
+
+
+def replan_mats(
+        tournament: models.Tournament,
+        now: datetime,
+        overruns: Optional[Dict[int, datetime]] = None,
+        mats: Optional[int] = None,
+) -> List[models.MatAssignment]:
+    """
+    Re-plans the pools that have not started yet, e.g. after a pool overran.
+
+    Pools that started before `now` stay on their mat; `overruns` moves the expected end of such pools, and raises
+    ValueError for pools that have not started. Each of the `mats` mats, by default as many as the plan uses, becomes
+    available again when its last started pool ends, and the remaining pools are re-assigned with their previously
+    estimated durations. Fewer `mats` than the highest mat with a started pool raise ValueError.
+    """
+    overruns = overruns or {}
+    with transaction.atomic():
+        assignments = list(models.MatAssignment.objects.select_for_update().filter(tournament=tournament))
+        if not assignments:
+            raise ValueError(f"Tournament {tournament.pk} has no mat plan yet.")
+        started = [assignment for assignment in assignments if assignment.start <= now]
+        waiting = [assignment for assignment in assignments if assignment.start > now]
+        not_started = sorted(set(overruns) - {assignment.pool_id for assignment in started})
+        if not_started:
+            raise ValueError(f"Pools {not_started} have not started yet.")
+
+        busy_mats = sorted({assignment.mat for assignment in started if mats is not None and assignment.mat > mats})
+        if busy_mats:
+            raise ValueError(f"Mats {busy_mats} have started pools, so the plan needs at least {busy_mats[-1]} mats.")
+
+        # Mats without a started pool are free right away, also when no pool is planned on them.
+        mats_free = {mat: now for mat in range(1, (mats or max(assignment.mat for assignment in assignments)) + 1)}
+        for assignment in started:
+            if assignment.pool_id in overruns:
+                assignment.end = overruns[assignment.pool_id]
+                assignment.save(update_fields=["end"])
+            mats_free[assignment.mat] = max(mats_free[assignment.mat], assignment.end)
+
+        durations = {assignment.pool_id: assignment.end - assignment.start for assignment in waiting}
+        slots = longest_processing_time(durations, [(free, mat) for mat, free in mats_free.items()])
+        return save_slots(tournament, slots, keep=started)
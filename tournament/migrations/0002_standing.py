@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:13
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def backfill_standings(apps, schema_editor):
+    Turn = apps.get_model('tournament', 'Turn')
+    Standing = apps.get_model('tournament', 'Standing')
+    turns = Turn.objects.filter(forms__scores__isnull=False).annotate(
+        technique=Sum('forms__scores__technique_score'),
+        presentation=Sum('forms__scores__presentation_score'),
+        count=Count('forms__scores'),
+    ).select_related('round')
+    Standing.objects.bulk_create([
+        Standing(
+            turn=turn,
+            round_id=turn.round_id,
+            pool_id=turn.round.pool_id,
+            team_id=turn.team_id,
+            technique_score=turn.technique,
+            presentation_score=turn.presentation,
+            total_score=turn.technique + turn.presentation,
+            score_count=turn.count,
+        )
+        for turn in turns
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Standing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('technique_score', models.PositiveIntegerField(default=0)),
+                ('presentation_score', models.PositiveIntegerField(default=0)),
+                ('total_score', models.PositiveIntegerField(default=0)),
+                ('score_count', models.PositiveIntegerField(default=0)),
+                ('pool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='tournament.pool')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='tournament.round')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='tournament.team')),
+                ('turn', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='standing', to='tournament.turn')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['round', '-total_score'], name='standing_round_rank_idx'), models.Index(fields=['pool', '-total_score'], name='standing_pool_rank_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_standings, migrations.RunPython.noop),
+    ]
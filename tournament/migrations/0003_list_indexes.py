@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0002_standing'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='form',
+            index=models.Index(fields=['turn', 'id'], name='form_turn_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['team', 'id'], name='participant_team_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pool',
+            index=models.Index(fields=['tournament', 'id'], name='pool_tournament_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='round',
+            index=models.Index(fields=['pool', 'id'], name='round_pool_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(fields=['form', 'id'], name='score_form_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['tournament', 'id'], name='team_tournament_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['pool', 'id'], name='team_pool_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='turn',
+            index=models.Index(fields=['round', 'id'], name='turn_round_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='turn',
+            index=models.Index(fields=['team', 'id'], name='turn_team_id_idx'),
+        ),
+    ]
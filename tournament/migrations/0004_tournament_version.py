@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0003_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Incremented by every write to the tournament or any object under it.'),
+        ),
+    ]
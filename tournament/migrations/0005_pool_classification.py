@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0004_tournament_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pool',
+            name='class_level',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pool',
+            name='max_age',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pool',
+            name='min_age',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pool',
+            name='sex',
+            field=models.CharField(blank=True, choices=[('F', 'Female'), ('M', 'Male')], max_length=1, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0005_pool_classification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mat', models.PositiveSmallIntegerField()),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('pool', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='mat_assignment', to='tournament.pool')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mat_assignments', to='tournament.tournament')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tournament', 'mat', 'start'], name='mat_assignment_slot_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0006_mat_assignment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PoolJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Q', 'Queued'), ('R', 'Running'), ('S', 'Succeeded'), ('F', 'Failed')], default='Q', max_length=1)),
+                ('progress', models.PositiveSmallIntegerField(default=0, help_text='Percentage of the job that is done.')),
+                ('max_pool_size', models.PositiveIntegerField(blank=True, null=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pool_jobs', to='tournament.tournament')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='pooljob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['Q', 'R'])), fields=('tournament',), name='one_active_pool_job_per_tournament'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0007_pool_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ruleset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64)),
+                ('classes', models.JSONField(help_text='Competition classes, e.g. [{"level": 1, "name": "D-Class", "description": "", "belt_grades": ["WH", "WY"]}].')),
+                ('age_groups', models.JSONField(help_text='Inclusive age ranges per pool type, e.g. {"S": [[0, 8], [9, 11]]}. Missing pool types use the default age groups.')),
+                ('version', models.PositiveIntegerField(default=0, editable=False, help_text='Incremented by every save, invalidating compiled copies of the ruleset.')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='ruleset',
+            field=models.ForeignKey(blank=True, help_text='Rules used to make the pools of this tournament. The default rules apply when empty.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='tournaments', to='tournament.ruleset'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0008_ruleset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='round',
+            name='closed',
+            field=models.DateTimeField(blank=True, help_text='When the best turns of this round moved on to the next round.', null=True),
+        ),
+    ]
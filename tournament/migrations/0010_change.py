@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:56
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0009_round_closed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('c', 'Created'), ('u', 'Updated'), ('d', 'Deleted')], max_length=1)),
+                ('model', models.CharField(help_text='Model name of the changed object, e.g. "score".', max_length=16)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('data', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='The changed fields and their new values, empty for deletions.', null=True)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='tournament.tournament')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tournament', 'id'], name='change_tournament_id_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,47 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+
+
+# Shared by participants and by the pools they are split into.
+class Sexes:
+    Female: str = "F"
+    Male: str = "M"
+SEXES = [
+    (Sexes.Female, "Female"),
+    (Sexes.Male, "Male"),
+]
+
+
+class Ruleset(models.Model):
+    """ Competition rules of a federation: which belt grades make up each class, and the age groups per pool type. """
+    name = models.CharField(
+        max_length=64,
+        blank=False,
+    )
+    classes = models.JSONField(
+        help_text='Competition classes, e.g. [{"level": 1, "name": "D-Class", "description": "", '
+                  '"belt_grades": ["WH", "WY"]}].',
+    )
+    age_groups = models.JSONField(
+        help_text='Inclusive age ranges per pool type, e.g. {"S": [[0, 8], [9, 11]]}. Missing pool types use the '
+                  'default age groups.',
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented by every save, invalidating compiled copies of the ruleset.",
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+    )
+
+    def save(self, *args, **kwargs):
+        self.version += 1
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return f"({self.pk}) {self.name}"
 
 
 class Tournament(models.Model):
@@ -9,9 +52,33 @@ class Tournament(models.Model):
     tournament_start = models.DateTimeField(
         blank=False,
     )
+    ruleset = models.ForeignKey(
+        "Ruleset",
+        related_name="tournaments",
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        help_text="Rules used to make the pools of this tournament. The default rules apply when empty.",
+    )
     created = models.DateTimeField(
         auto_now_add=True,
     )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented by every write to the tournament or any object under it.",
+    )
+
+    def save(self, *args, **kwargs):
+        # The version is only incremented in the database, so a copy loaded before a bump must not be written back.
+        # Objects saved to another database than they were read from are copied in full.
+        using = kwargs.get("using") or router.db_for_write(Tournament, instance=self)
+        if (not self._state.adding and self._state.db == using and kwargs.get("update_fields") is None
+                and not kwargs.get("force_insert")):
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != "version"
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         return f"({self.pk}) {self.name}"
@@ -40,6 +107,29 @@ class Pool(models.Model):
         choices=POOL_TYPES,
         blank=False,
     )
+    class_level = models.PositiveSmallIntegerField(
+        blank=True,
+        null=True,
+    )
+    sex = models.CharField(
+        max_length=1,
+        choices=SEXES,
+        blank=True,
+        null=True,
+    )
+    min_age = models.PositiveSmallIntegerField(
+        blank=True,
+        null=True,
+    )
+    max_age = models.PositiveSmallIntegerField(
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tournament", "id"], name="pool_tournament_id_idx"),
+        ]
 
 
 class Team(models.Model):
@@ -57,6 +147,12 @@ class Team(models.Model):
         null=True,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["tournament", "id"], name="team_tournament_id_idx"),
+            models.Index(fields=["pool", "id"], name="team_pool_id_idx"),
+        ]
+
     def __str__(self) -> str:
         if self.participants.count() > 0:
             return f"({self.pk}) {' & '.join([str(p) for p in self.participants.all()])}"
@@ -114,13 +210,8 @@ class Participant(models.Model):
         blank=False,
     )
 
-    class Sexes:
-        Female: str = "F"
-        Male: str = "M"
-    SEXES = [
-        (Sexes.Female, "Female"),
-        (Sexes.Male, "Male"),
-    ]
+    Sexes = Sexes
+    SEXES = SEXES
     sex = models.CharField(
         max_length=1,
         choices=SEXES,
@@ -130,6 +221,11 @@ class Participant(models.Model):
         blank=False,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["team", "id"], name="participant_team_id_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.name} ({self.sex[0]})"
 
@@ -144,6 +240,16 @@ class Round(models.Model):
     round_number = models.PositiveSmallIntegerField(
         blank=False,
     )
+    closed = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the best turns of this round moved on to the next round.",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["pool", "id"], name="round_pool_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Pool {self.pool.pk} - round {self.round_number}"
@@ -165,6 +271,10 @@ class Turn(models.Model):
     )
 
     class Meta:
+        indexes = [
+            models.Index(fields=["round", "id"], name="turn_round_id_idx"),
+            models.Index(fields=["team", "id"], name="turn_team_id_idx"),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['round', 'turn_order'], name='unique_migration_host_combination'
@@ -182,6 +292,11 @@ class Form(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["turn", "id"], name="form_turn_id_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.turn} - form {self.pk}"
 
@@ -198,3 +313,251 @@ class Score(models.Model):
     presentation_score = models.PositiveIntegerField(
         blank=False,
     )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["form", "id"], name="score_form_id_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_stored_values()
+        return instance
+
+    def remember_stored_values(self):
+        """ Remembers the values as stored in the database, so changes can be applied to standings as deltas. """
+        self._stored_values = (
+            self.__dict__.get("form_id"),
+            self.__dict__.get("technique_score"),
+            self.__dict__.get("presentation_score"),
+        )
+
+    def save(self, *args, **kwargs):
+        # Standings are updated from the post_save signal, which must be part of the same transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class Standing(models.Model):
+    """ Running score totals of a turn, updated by `tournament.standings` whenever one of its scores changes. """
+    turn = models.OneToOneField(
+        "Turn",
+        related_name="standing",
+        on_delete=models.CASCADE,
+    )
+    round = models.ForeignKey(
+        "Round",
+        related_name="standings",
+        on_delete=models.CASCADE,
+    )
+    pool = models.ForeignKey(
+        "Pool",
+        related_name="standings",
+        on_delete=models.CASCADE,
+    )
+    team = models.ForeignKey(
+        "Team",
+        related_name="standings",
+        on_delete=models.CASCADE,
+    )
+    technique_score = models.PositiveIntegerField(
+        default=0,
+    )
+    presentation_score = models.PositiveIntegerField(
+        default=0,
+    )
+    total_score = models.PositiveIntegerField(
+        default=0,
+    )
+    score_count = models.PositiveIntegerField(
+        default=0,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["round", "-total_score"], name="standing_round_rank_idx"),
+            models.Index(fields=["pool", "-total_score"], name="standing_pool_rank_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.turn} - {self.total_score} points"
+
+
+class MatAssignment(models.Model):
+    """ The planned mat and time slot of a pool, made by `tournament.mats`. """
+    tournament = models.ForeignKey(
+        "Tournament",
+        related_name="mat_assignments",
+        on_delete=models.CASCADE,
+    )
+    pool = models.OneToOneField(
+        "Pool",
+        related_name="mat_assignment",
+        on_delete=models.CASCADE,
+    )
+    mat = models.PositiveSmallIntegerField(
+        blank=False,
+    )
+    start = models.DateTimeField(
+        blank=False,
+    )
+    end = models.DateTimeField(
+        blank=False,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tournament", "mat", "start"], name="mat_assignment_slot_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Pool {self.pool_id} - mat {self.mat} at {self.start}"
+
+
+class PoolJob(models.Model):
+    """ A background run of pool creation for a tournament, executed by `tournament.jobs`. """
+    tournament = models.ForeignKey(
+        "Tournament",
+        related_name="pool_jobs",
+        on_delete=models.CASCADE,
+    )
+
+    class Statuses:
+        Queued: str = "Q"
+        Running: str = "R"
+        Succeeded: str = "S"
+        Failed: str = "F"
+    STATUSES = [
+        (Statuses.Queued, "Queued"),
+        (Statuses.Running, "Running"),
+        (Statuses.Succeeded, "Succeeded"),
+        (Statuses.Failed, "Failed"),
+    ]
+    ACTIVE_STATUSES = [Statuses.Queued, Statuses.Running]
+    status = models.CharField(
+        max_length=1,
+        choices=STATUSES,
+        default=Statuses.Queued,
+    )
+    progress = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Percentage of the job that is done.",
+    )
+    max_pool_size = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+    )
+    result = models.JSONField(
+        blank=True,
+        null=True,
+    )
+    error = models.TextField(
+        blank=True,
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+    )
+    finished = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tournament"],
+                condition=models.Q(status__in=["Q", "R"]),
+                name="one_active_pool_job_per_tournament",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"({self.pk}) Pool job for tournament {self.tournament_id} - {self.get_status_display()}"
+
+
+class Change(models.Model):
+    """
+    An entry of the append-only change log of a tournament, written by `tournament.changes`. Its id is the sequence
+    number clients sync from.
+    """
+    tournament = models.ForeignKey(
+        "Tournament",
+        related_name="changes",
+        on_delete=models.CASCADE,
+    )
+
+    class Actions:
+        Created: str = "c"
+        Updated: str = "u"
+        Deleted: str = "d"
+    ACTIONS = [
+        (Actions.Created, "Created"),
+        (Actions.Updated, "Updated"),
+        (Actions.Deleted, "Deleted"),
+    ]
+    action = models.CharField(
+        max_length=1,
+        choices=ACTIONS,
+    )
+    model = models.CharField(
+        max_length=16,
+        help_text="Model name of the changed object, e.g. \"score\".",
+    )
+    object_id = models.PositiveBigIntegerField()
+    data = models.JSONField(
+        blank=True,
+        null=True,
+        encoder=DjangoJSONEncoder,
+        help_text="The changed fields and their new values, empty for deletions.",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tournament", "id"], name="change_tournament_id_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"({self.pk}) {self.get_action_display()} {self.model} {self.object_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored result of a batched write operation, replayed when a client retries the operation with its key. Keys
+    are chosen by clients, so they are only unique per user.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="idempotency_keys",
+        on_delete=models.CASCADE,
+    )
+    key = models.CharField(
+        max_length=64,
+    )
+    operation_hash = models.CharField(
+        max_length=40,
+        help_text="Fingerprint of the operation, to reject a different operation that reuses the key.",
+    )
+    status = models.PositiveSmallIntegerField()
+    result = models.JSONField(
+        blank=True,
+        null=True,
+        encoder=DjangoJSONEncoder,
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created"], name="idempotency_key_created_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="unique_idempotency_key_per_user"),
+        ]
+
+    def __str__(self) -> str:
+        return f"({self.pk}) {self.key}"
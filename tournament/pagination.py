@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key.
+
+    Every page is a `WHERE id > cursor ORDER BY id LIMIT n` query, which the `(<relation>, id)` indexes serve in
+    constant time however deep the client pages.
+    """
+    ordering = "id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED = "<unresolved>"
+# Savepoints are timed but not counted, so query budgets also hold inside the transactions of test cases.
+UNCOUNTED_PREFIXES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+# Upper bounds in milliseconds of the latency histogram buckets. Slower requests go in a final overflow bucket.
+HISTOGRAM_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+@dataclass
+class RequestProfile:
+    url_name: str = UNRESOLVED
+    query_budget: Optional[int] = None
+    queries: int = 0
+    db_seconds: float = 0.0
+    serialization_seconds: float = 0.0
+    total_seconds: float = 0.0
+    serialization_depth: int = 0
+
+    @property
+    def over_budget(self) -> bool:
+        return self.query_budget is not None and self.queries > self.query_budget
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not sql.startswith(UNCOUNTED_PREFIXES):
+                self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+    def server_timing(self) -> str:
+        return ", ".join([
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f"serialize;dur={self.serialization_seconds * 1000:.1f}",
+            f"total;dur={self.total_seconds * 1000:.1f}",
+        ])
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("tournament_request_profile", default=None)
+
+
+def allow_extra_queries(amount: int):
+    """ Raises the query budget of the current request, for views whose query count depends on the request. """
+    profile = _current_profile.get()
+    if profile is not None and profile.query_budget is not None:
+        profile.query_budget += amount
+
+
+@contextmanager
+def timed_serialization():
+    """ Adds the time spent in this block to the serialization time of the current request, once when nested. """
+    profile = _current_profile.get()
+    if profile is None or profile.serialization_depth:
+        yield
+        return
+    profile.serialization_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialization_seconds += time.perf_counter() - start
+        profile.serialization_depth -= 1
+
+
+class TimedRepresentationMixin:
+    """ Counts the time serializers spend building representations as serialization time. """
+
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed_serialization():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+@dataclass
+class EndpointMetrics:
+    requests: int = 0
+    over_budget: int = 0
+    queries: int = 0
+    max_queries: int = 0
+    db_seconds: float = 0.0
+    serialization_seconds: float = 0.0
+    total_seconds: float = 0.0
+    histogram: List[int] = field(default_factory=lambda: [0] * (len(HISTOGRAM_BOUNDS_MS) + 1))
+
+    def add(self, profile: RequestProfile):
+        self.requests += 1
+        self.over_budget += profile.over_budget
+        self.queries += profile.queries
+        self.max_queries = max(self.max_queries, profile.queries)
+        self.db_seconds += profile.db_seconds
+        self.serialization_seconds += profile.serialization_seconds
+        self.total_seconds += profile.total_seconds
+        self.histogram[bisect_left(HISTOGRAM_BOUNDS_MS, profile.total_seconds * 1000)] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "over_budget": self.over_budget,
+            "mean_queries": self.queries / self.requests,
+            "max_queries": self.max_queries,
+            "mean_db_ms": self.db_seconds * 1000 / self.requests,
+            "mean_serialization_ms": self.serialization_seconds * 1000 / self.requests,
+            "mean_total_ms": self.total_seconds * 1000 / self.requests,
+            "histogram": self.histogram.copy(),
+        }
+
+
+class MetricsRegistry:
+    """ Request metrics per URL name, aggregated in this process since it started or was reset. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, EndpointMetrics] = {}
+
+    def record(self, profile: RequestProfile):
+        with self._lock:
+            self._endpoints.setdefault(profile.url_name, EndpointMetrics()).add(profile)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "histogram_bounds_ms": list(HISTOGRAM_BOUNDS_MS),
+                "endpoints": {name: metrics.as_dict() for name, metrics in sorted(self._endpoints.items())},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+metrics = MetricsRegistry()
+
+
+class ProfilingMiddleware:
+    """
+    Records the query count, database time, serialization time and total time of every request, and adds them to the
+    response as a `Server-Timing` header and to `metrics`, grouped by URL name.
+
+    Views can declare a `query_budget` per HTTP method, e.g. `{"GET": 4, "POST": 7}`, where HEAD requests use the GET
+    budget. Methods whose query count grows with the request, such as cascading deletes, are left out. Requests that
+    exceed their budget are logged and counted. The profile is also set on the response as `profile`, for tests. Time
+    spent streaming a response body is not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.TOURNAMENT_PROFILING:
+            return self.get_response(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(profile.record_query))
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        profile.total_seconds = time.perf_counter() - start
+        if request.resolver_match is not None:
+            profile.url_name = request.resolver_match.url_name or request.resolver_match.view_name
+        metrics.record(profile)
+        if profile.over_budget:
+            logger.warning("%s %s made %d queries, over its budget of %d.", request.method, profile.url_name,
+                           profile.queries, profile.query_budget)
+        response["Server-Timing"] = profile.server_timing()
+        response.profile = profile
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current_profile.get()
+        view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+        if profile is not None:
+            method = "GET" if request.method == "HEAD" else request.method
+            profile.query_budget = getattr(view_class, "query_budget", {}).get(method)
+        return None
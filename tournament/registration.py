@@ -0,0 +1,40 @@
+from typing import Iterable, List, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from tournament import models
+from tournament.assignment import assign_teams, has_made_pools
+from tournament.changes import created_changes, record
+from tournament.versioning import single_version_bump
+
+RegisteredTeamType = Tuple[models.Team, List[models.Participant]]
+
+
+def register_teams(tournament: models.Tournament, teams_data: Iterable[dict]) -> List[RegisteredTeamType]:
+    """
+    Creates teams and their participants from validated registration data.
+
+    Every team is a dict with a "participants" list of participant field dicts. All teams are inserted with one bulk
+    create, followed by one bulk create for all participants, inside a single transaction. Teams registered after the
+    pools were made are assigned to their matching pool.
+    """
+    teams_data = list(teams_data)
+    registered = [
+        (
+            models.Team(tournament=tournament),
+            [models.Participant(**participant_data) for participant_data in team_data["participants"]],
+        )
+        for team_data in teams_data
+    ]
+    with transaction.atomic(), single_version_bump(pk=tournament.pk):
+        models.Team.objects.bulk_create([team for team, _ in registered])
+        for team, participants in registered:
+            for participant in participants:
+                participant.team = team
+        registered_participants = [participant for _, participants in registered for participant in participants]
+        models.Participant.objects.bulk_create(registered_participants)
+        record(created_changes(tournament.pk, [team for team, _ in registered] + registered_participants))
+        if has_made_pools(tournament.pk):
+            assign_teams(tournament, [team.pk for team, _ in registered], settings.TOURNAMENT_MAX_POOL_SIZE)
+    return registered
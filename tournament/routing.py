@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_PIN_COOKIE = "primary_pin"
+
+_read_alias: ContextVar[Optional[str]] = ContextVar("tournament_read_alias", default=None)
+
+
+def is_tournament_model(model) -> bool:
+    return model._meta.app_label == "tournament"
+
+
+@contextmanager
+def replica_reads(alias: Optional[str]):
+    """ Reads tournament data from the database `alias` inside this block, until the first write. """
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads of tournament data to the read replica while `replica_reads` is active, and every write to the
+    primary. The first write inside a `replica_reads` block moves the rest of the block to the primary, so code reads
+    its own writes. Without an active block, all queries use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if is_tournament_model(model):
+            return _read_alias.get() or DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        _read_alias.set(None)
+        if is_tournament_model(model):
+            # Objects read from the replica would otherwise be saved back to it.
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, settings.TOURNAMENT_READ_REPLICA}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serves safe requests to the tournament views from `TOURNAMENT_READ_REPLICA`, if configured.
+
+    A successful unsafe request sets a cookie that keeps the client on the primary for
+    `TOURNAMENT_PRIMARY_PIN_SECONDS`, so it sees its own writes before they reach the replica.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.replica_token is not None:
+                _read_alias.reset(request.replica_token)
+        pin_seconds = settings.TOURNAMENT_PRIMARY_PIN_SECONDS
+        if request.method not in SAFE_METHODS and response.status_code < 400 and pin_seconds:
+            response.set_cookie(PRIMARY_PIN_COOKIE, "1", max_age=pin_seconds, httponly=True, samesite="Lax")
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        alias = settings.TOURNAMENT_READ_REPLICA
+        if (
+            alias
+            and request.method in SAFE_METHODS
+            and PRIMARY_PIN_COOKIE not in request.COOKIES
+            and view_func.__module__ == "tournament.views"
+        ):
+            request.replica_token = _read_alias.set(alias)
+        return None
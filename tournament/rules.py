@@ -1,8 +1,16 @@
-from dataclasses import dataclass
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
 from enum import Enum
-from typing import Dict, List, Tuple, Generator
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, IntegerField, Max, Min, OuterRef, Q, QuerySet, Subquery, Value, When
 
 from tournament import models
+from tournament.changes import created_changes, record, updated_changes
+from tournament.versioning import single_version_bump
 
 
 @dataclass(frozen=True)
@@ -78,46 +86,347 @@ AGE_GROUPS: Dict[str, List[Tuple[int, int]]] = {
 }
 
 
+BELT_GRADE_RANKS: Dict[str, int] = {
+    belt_grade: rank for rank, (belt_grade, _) in enumerate(models.Participant.BELT_GRADES)
+}
+
+
 def belt_grade_to_class(belt_grade: str) -> CompetitionClass:
     if belt_grade not in BELT_TO_GRADE_MAPPING:
         raise KeyError(f"Belt grade {belt_grade} not one of: {[grade[0] for grade in models.Participant.BELT_GRADES]}.")
     return BELT_TO_GRADE_MAPPING[belt_grade]
 
 
-ClassPoolsType = Dict[str, Dict[str, models.Pool]]
-def make_class_pools(tournament: models.Tournament) -> ClassPoolsType:
-    pool_type_solo = models.Pool.PoolType.Solo
-    pool_type_pair = models.Pool.PoolType.Pair
-    pair_pool = models.Pool(tournament=tournament, pool_type=pool_type_pair)
-    pool_type_team = models.Pool.PoolType.Team
-    return {
-        pool_type_solo: {
-            "F": models.Pool(tournament=tournament, pool_type=pool_type_solo),
-            "M": models.Pool(tournament=tournament, pool_type=pool_type_solo),
-        },
-        pool_type_pair: {
-            "F": pair_pool,
-            "M": pair_pool,
-        },
-        pool_type_team: {
-            "F": models.Pool(tournament=tournament, pool_type=pool_type_team),
-            "M": models.Pool(tournament=tournament, pool_type=pool_type_team),
-        }
+def age_on(birthdate: date, day: date) -> int:
+    return day.year - birthdate.year - ((day.month, day.day) < (birthdate.month, birthdate.day))
+
+
+@dataclass(frozen=True)
+class CompiledRuleset:
+    """
+    A ruleset compiled into lookup tables, so classifying a team never touches the stored ruleset.
+
+    `class_levels` holds the class level of every belt grade at the index of its `BELT_GRADE_RANKS` rank, or None for
+    belt grades the ruleset does not allow. `age_lower_bounds` holds the sorted lower bounds of `age_groups`, for
+    binary searches.
+    """
+    version: Tuple[int, Optional[datetime]]
+    class_levels: Tuple[Optional[int], ...]
+    classes: Dict[int, CompetitionClass]
+    lowest_class: CompetitionClass
+    age_groups: Dict[str, Tuple[Tuple[int, int], ...]]
+    age_lower_bounds: Dict[str, Tuple[int, ...]]
+    class_level_expression: Case = field(compare=False)
+
+    def allows(self, belt_grade: str) -> bool:
+        return belt_grade in BELT_GRADE_RANKS and self.class_levels[BELT_GRADE_RANKS[belt_grade]] is not None
+
+    def competition_class(self, level: Optional[int]) -> CompetitionClass:
+        return self.classes.get(level, self.lowest_class)
+
+    def age_group(self, pool_type: str, age: int) -> Optional[Tuple[int, int]]:
+        """
+        Finds the age group of a pool type containing `age` with a binary search over the group lower bounds, or None
+        when the age is below, above or between the age groups.
+        """
+        index = bisect_right(self.age_lower_bounds[pool_type], age) - 1
+        if index < 0:
+            return None
+        group = self.age_groups[pool_type][index]
+        return group if age <= group[1] else None
+
+
+def compile_ruleset(
+        classes: Iterable[Tuple[CompetitionClass, Iterable[str]]],
+        age_groups: Dict[str, Iterable[Iterable[int]]],
+        version: Tuple[int, Optional[datetime]] = (0, None),
+) -> CompiledRuleset:
+    """ Compiles competition classes with their belt grades, and age groups per pool type, into a `CompiledRuleset`. """
+    class_levels: List[Optional[int]] = [None] * len(BELT_GRADE_RANKS)
+    classes_by_level = {}
+    for competition_class, belt_grades in classes:
+        classes_by_level[competition_class.level] = competition_class
+        for belt_grade in belt_grades:
+            class_levels[BELT_GRADE_RANKS[belt_grade]] = competition_class.level
+    groups = {
+        pool_type: tuple(sorted((low, high) for low, high in age_groups.get(pool_type, default_groups)))
+        for pool_type, default_groups in AGE_GROUPS.items()
     }
+    return CompiledRuleset(
+        version=version,
+        class_levels=tuple(class_levels),
+        classes=classes_by_level,
+        lowest_class=classes_by_level[min(classes_by_level)],
+        age_groups=groups,
+        age_lower_bounds={pool_type: tuple(low for low, _ in pool_groups) for pool_type, pool_groups in groups.items()},
+        class_level_expression=Case(
+            *[
+                When(participants__belt_grade=belt_grade, then=Value(class_levels[rank]))
+                for belt_grade, rank in BELT_GRADE_RANKS.items()
+                if class_levels[rank] is not None
+            ],
+            output_field=IntegerField(),
+        ),
+    )
+
+
+def compile_stored_ruleset(ruleset: models.Ruleset) -> CompiledRuleset:
+    return compile_ruleset(
+        [
+            (
+                CompetitionClass(
+                    name=class_data["name"],
+                    description=class_data.get("description", ""),
+                    level=class_data["level"],
+                ),
+                class_data["belt_grades"],
+            )
+            for class_data in ruleset.classes
+        ],
+        ruleset.age_groups,
+        (ruleset.version, ruleset.updated),
+    )
+
+
+DEFAULT_RULESET = compile_ruleset(
+    [
+        (
+            competition_class,
+            [belt_grade for belt_grade, belt_class in BELT_TO_GRADE_MAPPING.items() if belt_class == competition_class],
+        )
+        for competition_class in (A_CLASS, B_CLASS, C_CLASS, D_CLASS)
+    ],
+    AGE_GROUPS,
+)
+
+_compiled_rulesets: Dict[int, CompiledRuleset] = {}
+
+
+def get_ruleset(ruleset_id: Optional[int], version: Tuple[int, Optional[datetime]] = (0, None)) -> CompiledRuleset:
+    """
+    Returns the compiled ruleset with the given id, or the default ruleset for None.
+
+    Compiled rulesets are cached per process. The stored ruleset is only read again when `version`, its stored version
+    and update time, differs from the cached copy.
+    """
+    if ruleset_id is None:
+        return DEFAULT_RULESET
+    compiled = _compiled_rulesets.get(ruleset_id)
+    if compiled is None or compiled.version != version:
+        compiled = compile_stored_ruleset(models.Ruleset.objects.get(pk=ruleset_id))
+        _compiled_rulesets[ruleset_id] = compiled
+    return compiled
+
 
+def tournament_ruleset(tournament_id: int) -> CompiledRuleset:
+    """ Returns the compiled ruleset of a tournament, checking the cached copy with a single query. """
+    ruleset_id, version, updated = models.Tournament.objects.filter(pk=tournament_id).values_list(
+        "ruleset_id", "ruleset__version", "ruleset__updated",
+    ).get()
+    return get_ruleset(ruleset_id, (version, updated))
 
-TournamentPoolsType = Dict[CompetitionClass, ClassPoolsType]
-def make_tournament_pools(tournament: models.Tournament) -> TournamentPoolsType:
-    return {
-        D_CLASS: make_class_pools(tournament),
-        C_CLASS: make_class_pools(tournament),
-        B_CLASS: make_class_pools(tournament),
-        A_CLASS: make_class_pools(tournament),
+
+def age_group(pool_type: str, age: int) -> Optional[Tuple[int, int]]:
+    return DEFAULT_RULESET.age_group(pool_type, age)
+
+
+@dataclass(frozen=True, order=True)
+class PoolKey:
+    """ The classification shared by all teams in a pool. Pair pools are mixed, so their sex is empty. """
+    class_level: int
+    pool_type: str
+    sex: str
+    min_age: int
+    max_age: int
+
+    @classmethod
+    def of(cls, pool: models.Pool) -> Optional["PoolKey"]:
+        """ The key of a pool made by `make_pools`, or None for pools created by hand. """
+        if pool.class_level is None:
+            return None
+        return cls(pool.class_level, pool.pool_type, pool.sex or "", pool.min_age, pool.max_age)
+
+    def pool_filter(self) -> Q:
+        return Q(
+            class_level=self.class_level,
+            pool_type=self.pool_type,
+            sex=self.sex or None,
+            min_age=self.min_age,
+            max_age=self.max_age,
+        )
+
+    def make_pool(self, tournament: models.Tournament) -> models.Pool:
+        return models.Pool(
+            tournament=tournament,
+            pool_type=self.pool_type,
+            class_level=self.class_level,
+            sex=self.sex or None,
+            min_age=self.min_age,
+            max_age=self.max_age,
+        )
+
+
+def annotate_team_classification(teams: QuerySet, ruleset: CompiledRuleset = DEFAULT_RULESET) -> QuerySet:
+    """
+    Annotates teams with their participant count, highest class level under `ruleset`, the sex of their first
+    participant and the birthdate of their oldest participant.
+    """
+    first_participant = models.Participant.objects.filter(team=OuterRef("pk")).order_by("pk")
+    return teams.annotate(
+        participant_count=Count("participants"),
+        class_level=Max(ruleset.class_level_expression),
+        first_sex=Subquery(first_participant.values("sex")[:1]),
+        oldest_birthdate=Min("participants__birthdate"),
+    )
+
+
+def team_pool_key(
+        team: models.Team,
+        tournament_day: date,
+        ruleset: CompiledRuleset = DEFAULT_RULESET,
+) -> Optional[PoolKey]:
+    """
+    Classifies a team annotated by `annotate_team_classification`, using the age of its oldest participant. Teams
+    whose age is in none of the ruleset's age groups have no pool key.
+    """
+    team_class = ruleset.competition_class(team.class_level)
+    if team.participant_count == 1:
+        pool_type, sex = models.Pool.PoolType.Solo, team.first_sex
+    elif team.participant_count == 2:
+        pool_type, sex = models.Pool.PoolType.Pair, ""
+    elif team.participant_count > 2:
+        pool_type, sex = models.Pool.PoolType.Team, team.first_sex
+    else:
+        raise ValueError(f"Team {team.pk} has no participants.")
+    group = ruleset.age_group(pool_type, age_on(team.oldest_birthdate, tournament_day))
+    if group is None:
+        return None
+    return PoolKey(team_class.level, pool_type, sex, *group)
+
+
+def in_pool_of(team: models.Team, key: Optional[PoolKey]) -> bool:
+    """ Whether a team is in a pool made for `key` already, or has no pool while it has no key. """
+    if team.pool is None:
+        return key is None
+    return key is not None and PoolKey.of(team.pool) == key
+
+
+def make_pools(tournament: models.Tournament) -> List[int]:
+    """
+    Creates the pools of a tournament and assigns every team to one of them. Returns the ids of the teams left without
+    a pool, because they have no participants or their age is in none of the ruleset's age groups.
+
+    Teams are split by class, pool type, sex and age group of the tournament's ruleset, and pools are only created for
+    combinations that have teams. Running it again keeps every pool whose key still matches its teams, and leaves
+    pools that already have rounds and their teams alone. The number of queries does not depend on the number of
+    teams: all teams are classified by a single annotated query and moved with one bulk update.
+    """
+    tournament_day = tournament.tournament_start.date()
+    ruleset = tournament_ruleset(tournament.pk)
+    started = Exists(models.Round.objects.filter(pool=OuterRef("pool")))
+    with transaction.atomic(), single_version_bump(pk=tournament.pk):
+        teams = list(annotate_team_classification(
+            models.Team.objects.filter(tournament=tournament).exclude(started).select_related("pool"), ruleset,
+        ))
+        team_keys = [team_pool_key(team, tournament_day, ruleset) if team.participant_count else None for team in teams]
+        # New teams of a key join its oldest pool; `split_pools` evens out the sub-pools afterwards.
+        pools: Dict[Optional[PoolKey], Optional[models.Pool]] = {None: None}
+        for pool in sorted({team.pool for team in teams if team.pool is not None}, key=lambda pool: pool.pk):
+            if pool.class_level is not None:
+                pools.setdefault(PoolKey.of(pool), pool)
+        missing = {key: key.make_pool(tournament) for key in sorted(set(team_keys) - pools.keys())}
+        models.Pool.objects.bulk_create(missing.values())
+        pools.update(missing)
+        changes = created_changes(tournament.pk, missing.values())
+
+        moved, team_ids_by_key = [], defaultdict(list)
+        for team, key in zip(teams, team_keys):
+            if in_pool_of(team, key):
+                continue
+            team.pool = pools[key]
+            moved.append(team)
+            team_ids_by_key[key].append(team.pk)
+        models.Team.objects.bulk_update(moved, ["pool"])
+        for key, team_ids in team_ids_by_key.items():
+            changes += updated_changes(tournament.pk, models.Team, team_ids, pool=pools[key])
+        record(changes)
+
+        tournament.pools.filter(teams__isnull=True).exclude(
+            Exists(models.Round.objects.filter(pool=OuterRef("pk")))
+        ).delete()
+    return [team.pk for team, key in zip(teams, team_keys) if key is None]
+
+
+def deal(items: list, hands: int) -> List[list]:
+    """ Deals sorted items over `hands` in serpentine order (0, 1, .., n - 1, n - 1, .., 0), balancing the hands. """
+    dealt = [[] for _ in range(hands)]
+    for index, item in enumerate(items):
+        lap, position = divmod(index, hands)
+        dealt[position if lap % 2 == 0 else hands - 1 - position].append(item)
+    return dealt
+
+
+def split_pools(pools: QuerySet, max_pool_size: int) -> List[models.Pool]:
+    """
+    Splits every pool with more than `max_pool_size` teams into evenly sized sub-pools with the same classification.
+
+    Teams are sorted by highest belt grade and age, then dealt over the sub-pools, so each sub-pool gets a similar
+    mix. The first sub-pool is the original pool. Pools that already have rounds are left alone, and pools within the
+    limit are not touched, so splitting again is a no-op. Returns the newly created pools.
+    """
+    if max_pool_size < 1:
+        raise ValueError("The maximum pool size must be at least 1.")
+    oversized = {
+        pool.pk: pool
+        for pool in pools.annotate(team_count=Count("teams")).filter(
+            ~Exists(models.Round.objects.filter(pool=OuterRef("pk"))),
+            team_count__gt=max_pool_size,
+        )
     }
+    if not oversized:
+        return []
+    belt_ranks = Case(
+        *[When(participants__belt_grade=belt_grade, then=Value(rank)) for belt_grade, rank in BELT_GRADE_RANKS.items()],
+        output_field=IntegerField(),
+    )
+    teams = models.Team.objects.filter(pool__in=oversized).annotate(
+        belt_rank=Max(belt_ranks),
+        oldest_birthdate=Min("participants__birthdate"),
+    ).order_by("pool_id", "-belt_rank", "oldest_birthdate", "pk")
+    teams_by_pool = defaultdict(list)
+    for team in teams:
+        teams_by_pool[team.pool_id].append(team.pk)
+
+    new_pools, hands = [], []
+    for pool_id, team_ids in teams_by_pool.items():
+        pool = oversized[pool_id]
+        sub_pool_amount = -(-len(team_ids) // max_pool_size)
+        # The first hand stays in the original pool.
+        _, *other_hands = deal(team_ids, sub_pool_amount)
+        for hand in other_hands:
+            new_pools.append(models.Pool(
+                tournament_id=pool.tournament_id,
+                pool_type=pool.pool_type,
+                class_level=pool.class_level,
+                sex=pool.sex,
+                min_age=pool.min_age,
+                max_age=pool.max_age,
+            ))
+            hands.append(hand)
+
+    tournament_ids = {pool.tournament_id for pool in oversized.values()}
+    with transaction.atomic(), single_version_bump(pk__in=tournament_ids):
+        models.Pool.objects.bulk_create(new_pools)
+        changes = []
+        for pool, team_ids in zip(new_pools, hands):
+            models.Team.objects.filter(pk__in=team_ids).update(pool=pool)
+            changes += created_changes(pool.tournament_id, [pool])
+            changes += updated_changes(pool.tournament_id, models.Team, team_ids, pool=pool)
+        record(changes)
+    return new_pools
 
 
-def tournament_pools_walker(pools: TournamentPoolsType) -> Generator[models.Pool, None, None]:
-    for class_pools in pools.values():
-        for team_type_pool in class_pools.values():
-            for sex_pool in team_type_pool.values():
-                yield sex_pool
+def split_tournament_pools(tournament: models.Tournament, max_pool_size: Optional[int]) -> List[models.Pool]:
+    if max_pool_size is None:
+        return []
+    return split_pools(models.Pool.objects.filter(tournament=tournament), max_pool_size)
@@ -0,0 +1,142 @@
+import heapq
+import random
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, QuerySet
+from django.utils import timezone
+
+from tournament import models
+from tournament.changes import created_changes, record, updated_changes
+from tournament.leaderboards import turn_scores
+from tournament.live import publish_created_turns
+from tournament.versioning import single_version_bump
+
+REGISTRATION_ORDER = "registration"
+RANDOM_ORDER = "random"
+TURN_ORDERS = [REGISTRATION_ORDER, RANDOM_ORDER]
+# Turn orders of later rounds: best ranked team first, or last.
+RANK_ORDER = "rank"
+REVERSE_RANK_ORDER = "reverse_rank"
+SEEDED_TURN_ORDERS = [REVERSE_RANK_ORDER, RANK_ORDER]
+
+ScheduledRoundType = Tuple[models.Round, List[models.Turn]]
+
+
+def make_first_rounds(
+        tournament: models.Tournament,
+        turn_order: str = REGISTRATION_ORDER,
+        seed: Optional[int] = None,
+) -> List[ScheduledRoundType]:
+    """
+    Creates round 1, with a turn for every team, for each pool of the tournament that has no rounds yet.
+
+    Turns follow registration order, or a random order from `seed`. All rounds and turns are inserted with bulk
+    creates in one transaction that holds a lock on the tournament, so concurrent requests do not collide on turn
+    orders; pools that were scheduled in the meantime are skipped.
+    """
+    if turn_order not in TURN_ORDERS:
+        raise ValueError(f"Turn order {turn_order} not one of: {TURN_ORDERS}.")
+    rng = random.Random(seed)
+    with transaction.atomic(), single_version_bump(pk=tournament.pk):
+        list(models.Tournament.objects.select_for_update().filter(pk=tournament.pk))
+        pool_ids = list(
+            tournament.pools.filter(~Exists(models.Round.objects.filter(pool=OuterRef("pk"))))
+            .order_by("pk").values_list("pk", flat=True)
+        )
+        team_ids_by_pool = defaultdict(list)
+        teams = models.Team.objects.filter(pool__in=pool_ids).order_by("pool_id", "pk")
+        for pool_id, team_id in teams.values_list("pool_id", "pk"):
+            team_ids_by_pool[pool_id].append(team_id)
+
+        rounds = models.Round.objects.bulk_create([
+            models.Round(pool_id=pool_id, round_number=1) for pool_id in pool_ids
+        ])
+        scheduled = []
+        for round_obj in rounds:
+            team_ids = team_ids_by_pool[round_obj.pool_id]
+            if turn_order == RANDOM_ORDER:
+                rng.shuffle(team_ids)
+            scheduled.append((round_obj, [
+                models.Turn(round=round_obj, turn_order=order, team_id=team_id)
+                for order, team_id in enumerate(team_ids, start=1)
+            ]))
+        all_turns = [turn for _, turns in scheduled for turn in turns]
+        models.Turn.objects.bulk_create(all_turns)
+        record(created_changes(tournament.pk, rounds) + created_changes(tournament.pk, all_turns))
+        publish_created_turns(tournament.pk, scheduled)
+    return scheduled
+
+
+def turn_rank_key(turn: dict) -> Tuple[float, int, int]:
+    """
+    Ranks turns as their leaderboard does, by trimmed score and then total score, and breaks the remaining ties by
+    performing earlier. Unscored turns have 0.
+    """
+    return turn["trimmed_score"], turn["total_score"], -turn["turn_order"]
+
+
+def best_turns(turns: Iterable[dict], amount: int) -> List[dict]:
+    """ Selects the `amount` best ranked turns, best first, with a heap instead of sorting all turns. """
+    return heapq.nlargest(amount, turns, key=turn_rank_key)
+
+
+def advance_rounds(
+        rounds: QuerySet,
+        advance: int,
+        turn_order: str = REVERSE_RANK_ORDER,
+) -> List[ScheduledRoundType]:
+    """
+    Closes the given rounds and creates the next round of each pool with its `advance` best ranked teams.
+
+    Only the latest open round of a pool can advance, and rounds with no more than `advance` turns are final, so
+    they are left open. Turns are ranked as on their round's leaderboard. The next rounds and their turns are inserted
+    with bulk creates in one transaction that holds a lock on the tournaments, so the number of queries does not
+    depend on the number of pools or turns.
+    """
+    if advance < 1:
+        raise ValueError("At least one team must advance.")
+    if turn_order not in SEEDED_TURN_ORDERS:
+        raise ValueError(f"Turn order {turn_order} not one of: {SEEDED_TURN_ORDERS}.")
+    tournament_ids = set(rounds.values_list("pool__tournament_id", flat=True))
+    with transaction.atomic(), single_version_bump(pk__in=tournament_ids):
+        list(models.Tournament.objects.select_for_update().filter(pk__in=tournament_ids))
+        later_rounds = models.Round.objects.filter(pool=OuterRef("pool"), round_number__gt=OuterRef("round_number"))
+        open_rounds = {
+            round_obj.pk: round_obj
+            for round_obj in rounds.filter(closed__isnull=True).exclude(Exists(later_rounds)).annotate(
+                tournament_id=F("pool__tournament_id"),
+            ).order_by("pool_id")
+        }
+        turns_by_round = defaultdict(list)
+        for turn in turn_scores(models.Turn.objects.filter(round__in=open_rounds)).values(
+            "round_id", "team_id", "turn_order", "trimmed_score", "total_score",
+        ):
+            turns_by_round[turn["round_id"]].append(turn)
+
+        closing = [round_id for round_id in open_rounds if len(turns_by_round[round_id]) > advance]
+        next_rounds = models.Round.objects.bulk_create([
+            models.Round(pool_id=open_rounds[round_id].pool_id, round_number=open_rounds[round_id].round_number + 1)
+            for round_id in closing
+        ])
+        scheduled = []
+        for round_id, next_round in zip(closing, next_rounds):
+            advancing = best_turns(turns_by_round[round_id], advance)
+            if turn_order == REVERSE_RANK_ORDER:
+                advancing.reverse()
+            scheduled.append((next_round, [
+                models.Turn(round=next_round, turn_order=order, team_id=turn["team_id"])
+                for order, turn in enumerate(advancing, start=1)
+            ]))
+        models.Turn.objects.bulk_create([turn for _, turns in scheduled for turn in turns])
+        closed = timezone.now()
+        models.Round.objects.filter(pk__in=closing).update(closed=closed)
+        changes = []
+        for round_id, (next_round, turns) in zip(closing, scheduled):
+            tournament_id = open_rounds[round_id].tournament_id
+            changes += created_changes(tournament_id, [next_round, *turns])
+            changes += updated_changes(tournament_id, models.Round, [round_id], closed=closed)
+            publish_created_turns(tournament_id, [(next_round, turns)])
+        record(changes)
+    return scheduled
@@ -0,0 +1,90 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db import transaction
+from django.db.models import Subquery
+
+from tournament import models
+from tournament.changes import created_changes, record
+from tournament.live import broker, publish_on_commit
+from tournament.standings import apply_score_delta
+from tournament.versioning import single_version_bump
+
+
+def trimmed_mean(values: Sequence[int]) -> Optional[float]:
+    """ The mean without the highest and the lowest value. Falls back to the plain mean below three values. """
+    if not values:
+        return None
+    values = sorted(values)
+    if len(values) >= 3:
+        values = values[1:-1]
+    return sum(values) / len(values)
+
+
+def form_results(form_ids: Iterable[int]) -> List[dict]:
+    """ Aggregates all stored judge scores of the given forms, in one query. """
+    form_ids = list(form_ids)
+    scores = defaultdict(list)
+    for score in models.Score.objects.filter(form_id__in=form_ids).order_by("pk").values(
+        "id", "form_id", "technique_score", "presentation_score",
+    ):
+        scores[score.pop("form_id")].append(score)
+    results = []
+    for form_id in form_ids:
+        form_scores = scores[form_id]
+        technique = sum(score["technique_score"] for score in form_scores)
+        presentation = sum(score["presentation_score"] for score in form_scores)
+        results.append({
+            "form": form_id,
+            "scores": form_scores,
+            "score_count": len(form_scores),
+            "technique_score": technique,
+            "presentation_score": presentation,
+            "total_score": technique + presentation,
+            "trimmed_mean": trimmed_mean(
+                [score["technique_score"] + score["presentation_score"] for score in form_scores]
+            ),
+        })
+    return results
+
+
+def submit_scores(turn: models.Turn, scores_by_form: Dict[int, List[dict]]) -> List[dict]:
+    """
+    Stores the judge scores of one or more forms of a turn, and returns the aggregated results of those forms.
+
+    Every form's scores are dicts with a technique and presentation score. All scores are inserted with one bulk
+    create, and the turn's standing is updated with one combined delta, so the number of queries does not depend on
+    the number of judges or forms.
+    """
+    scores = [
+        models.Score(form_id=form_id, **score_data)
+        for form_id, form_scores in scores_by_form.items()
+        for score_data in form_scores
+    ]
+    with transaction.atomic(), single_version_bump(pools__rounds__turns=turn.pk):
+        models.Score.objects.bulk_create(scores)
+        if scores:
+            apply_score_delta(
+                scores[0].form_id,
+                sum(score.technique_score for score in scores),
+                sum(score.presentation_score for score in scores),
+                len(scores),
+            )
+        record(created_changes(
+            Subquery(models.Tournament.objects.filter(pools__rounds=turn.round_id).values("pk")), scores,
+        ))
+        if broker.has_subscribers():
+            pool_id, tournament_id = models.Round.objects.filter(pk=turn.round_id).values_list(
+                "pool_id", "pool__tournament_id",
+            ).get()
+            for score in scores:
+                publish_on_commit(tournament_id, pool_id, {
+                    "type": "score",
+                    "action": "saved",
+                    "id": score.pk,
+                    "form": score.form_id,
+                    "turn": turn.pk,
+                    "technique_score": score.technique_score,
+                    "presentation_score": score.presentation_score,
+                })
+    return form_results(scores_by_form)
@@ -1,51 +1,309 @@
 from rest_framework import serializers
 
 import tournament.models as models
+from tournament.fieldsets import SparseFieldsetSerializerMixin
+from tournament.profiling import TimedRepresentationMixin
+from tournament.rules import AGE_GROUPS, DEFAULT_RULESET, tournament_ruleset
+from tournament.schedule import REGISTRATION_ORDER, REVERSE_RANK_ORDER, SEEDED_TURN_ORDERS, TURN_ORDERS
 
 
-class TournamentSerializer(serializers.ModelSerializer):
+class TournamentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Tournament
-        fields = ["id", "name", "tournament_start", "created", "pools", "teams"]
+        fields = ["id", "name", "tournament_start", "ruleset", "created", "version", "pools", "teams"]
 
 
-class PoolSerializer(serializers.ModelSerializer):
+class PoolSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Pool
-        fields = ["id", "tournament", "rounds", "teams"]
+        fields = ["id", "tournament", "pool_type", "class_level", "sex", "min_age", "max_age", "rounds", "teams"]
 
 
-class TeamSerializer(serializers.ModelSerializer):
+class TeamSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Team
         fields = ["id", "tournament", "pool", "participants"]
 
 
-class ParticipantSerializer(serializers.ModelSerializer):
+def validate_allowed_belt_grade(belt_grade: str, ruleset) -> str:
+    if not ruleset.allows(belt_grade):
+        raise serializers.ValidationError(f"Belt grade {belt_grade} is not allowed by the tournament's ruleset.")
+    return belt_grade
+
+
+class ParticipantSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Participant
         fields = ["id", "team", "name", "belt_grade", "sex", "birthdate"]
 
+    def validate(self, attrs):
+        team = attrs.get("team", getattr(self.instance, "team", None))
+        belt_grade = attrs.get("belt_grade", getattr(self.instance, "belt_grade", None))
+        try:
+            validate_allowed_belt_grade(belt_grade, tournament_ruleset(team.tournament_id))
+        except serializers.ValidationError as error:
+            raise serializers.ValidationError({"belt_grade": error.detail})
+        return attrs
+
+
+class RulesetClassSerializer(serializers.Serializer):
+    level = serializers.IntegerField(min_value=1)
+    name = serializers.CharField(max_length=64)
+    description = serializers.CharField(max_length=256, allow_blank=True, default="")
+    belt_grades = serializers.ListField(
+        child=serializers.ChoiceField(choices=models.Participant.BELT_GRADES),
+        allow_empty=False,
+    )
 
-class RoundSerializer(serializers.ModelSerializer):
+
+class RulesetSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = models.Ruleset
+        fields = ["id", "name", "classes", "age_groups", "version", "updated"]
+
+    def validate_classes(self, classes):
+        serializer = RulesetClassSerializer(data=classes, many=True, allow_empty=False)
+        serializer.is_valid(raise_exception=True)
+        classes = [dict(class_data) for class_data in serializer.validated_data]
+        levels = [class_data["level"] for class_data in classes]
+        if len(set(levels)) != len(levels):
+            raise serializers.ValidationError("Class levels must be unique.")
+        belt_grades = [belt_grade for class_data in classes for belt_grade in class_data["belt_grades"]]
+        if len(set(belt_grades)) != len(belt_grades):
+            raise serializers.ValidationError("A belt grade can only be part of one class.")
+        return classes
+
+    def validate_age_groups(self, age_groups):
+        if not isinstance(age_groups, dict):
+            raise serializers.ValidationError("Expected an object with age groups per pool type.")
+        groups_field = serializers.ListField(
+            child=serializers.ListField(child=serializers.IntegerField(min_value=0), min_length=2, max_length=2),
+            allow_empty=False,
+        )
+        validated = {}
+        for pool_type, groups in age_groups.items():
+            if pool_type not in AGE_GROUPS:
+                raise serializers.ValidationError(f"Pool type {pool_type} not one of: {list(AGE_GROUPS)}.")
+            groups = sorted(groups_field.run_validation(groups))
+            previous_high = -1
+            for low, high in groups:
+                if low > high or low != previous_high + 1:
+                    raise serializers.ValidationError(
+                        f"Age groups of pool type {pool_type} must be ranges from age 0 without gaps or overlaps."
+                    )
+                previous_high = high
+            validated[pool_type] = groups
+        return validated
+
+
+class RoundSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Round
-        fields = ["id", "pool", "round_number", "turns"]
+        fields = ["id", "pool", "round_number", "closed", "turns"]
+        read_only_fields = ["closed"]
 
 
-class TurnSerializer(serializers.ModelSerializer):
+class TurnSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Turn
         fields = ["id", "round", "turn_order", "team"]
 
 
-class FormSerializer(serializers.ModelSerializer):
+class FormSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Form
         fields = ["id", "turn"]
 
 
-class ScoreSerializer(serializers.ModelSerializer):
+class ScoreSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = models.Score
         fields = ["id", "form", "technique_score", "presentation_score"]
+
+
+class ScoreSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Score
+        fields = ["id", "technique_score", "presentation_score"]
+
+
+class FormSnapshotSerializer(serializers.ModelSerializer):
+    scores = ScoreSnapshotSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Form
+        fields = ["id", "scores"]
+
+
+class TurnSnapshotSerializer(serializers.ModelSerializer):
+    forms = FormSnapshotSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Turn
+        fields = ["id", "turn_order", "team", "forms"]
+
+
+class RoundSnapshotSerializer(serializers.ModelSerializer):
+    turns = TurnSnapshotSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Round
+        fields = ["id", "round_number", "turns"]
+
+
+class ParticipantSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Participant
+        fields = ["id", "name", "belt_grade", "sex", "birthdate"]
+
+
+class TeamSnapshotSerializer(serializers.ModelSerializer):
+    participants = ParticipantSnapshotSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Team
+        fields = ["id", "participants"]
+
+
+class PoolSnapshotSerializer(serializers.ModelSerializer):
+    teams = TeamSnapshotSerializer(many=True, read_only=True)
+    rounds = RoundSnapshotSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Pool
+        fields = ["id", "pool_type", "class_level", "sex", "min_age", "max_age", "teams", "rounds"]
+
+
+class TournamentSnapshotSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    pools = PoolSnapshotSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = models.Tournament
+        fields = ["id", "name", "tournament_start", "created", "pools"]
+
+
+class PoolSplitSerializer(serializers.Serializer):
+    max_pool_size = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+
+
+class AssignPoolsSerializer(serializers.Serializer):
+    teams = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+
+class ScheduleRequestSerializer(serializers.Serializer):
+    turn_order = serializers.ChoiceField(choices=TURN_ORDERS, default=REGISTRATION_ORDER)
+    seed = serializers.IntegerField(required=False, allow_null=True)
+
+
+class AdvanceRequestSerializer(serializers.Serializer):
+    advance = serializers.IntegerField(min_value=1)
+    turn_order = serializers.ChoiceField(choices=SEEDED_TURN_ORDERS, default=REVERSE_RANK_ORDER)
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    ACTIONS = ["create", "update", "delete"]
+    MODELS = ["turn", "form", "score"]
+    key = serializers.CharField(max_length=64)
+    action = serializers.ChoiceField(choices=ACTIONS)
+    model = serializers.ChoiceField(choices=MODELS)
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False, default=dict)
+
+    def validate(self, attrs: dict) -> dict:
+        if attrs["action"] != "create" and "id" not in attrs:
+            raise serializers.ValidationError({"id": "An id is required to update or delete."})
+        return attrs
+
+
+class BatchSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_operations(self, operations: list) -> list:
+        keys = [operation["key"] for operation in operations]
+        if len(set(keys)) < len(keys):
+            raise serializers.ValidationError("Every operation needs its own key.")
+        return operations
+
+
+class ChangesRequestSerializer(serializers.Serializer):
+    since = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=500)
+
+
+class LeaderboardRequestSerializer(serializers.Serializer):
+    top = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class ClassLeaderboardRequestSerializer(LeaderboardRequestSerializer):
+    class_level = serializers.IntegerField(min_value=1)
+    pool_type = serializers.ChoiceField(choices=models.Pool.POOL_TYPES, required=False)
+
+
+class MatAssignmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.MatAssignment
+        fields = ["pool", "mat", "start", "end"]
+
+
+class MatPlanRequestSerializer(serializers.Serializer):
+    mats = serializers.IntegerField(min_value=1)
+    forms_per_turn = serializers.IntegerField(min_value=1, default=2)
+    seconds_per_form = serializers.IntegerField(min_value=1, default=90)
+    seconds_between_turns = serializers.IntegerField(min_value=0, default=30)
+
+
+class PoolOverrunSerializer(serializers.Serializer):
+    end = serializers.DateTimeField()
+    mats = serializers.IntegerField(min_value=1, required=False)
+
+
+class PoolJobSerializer(serializers.ModelSerializer):
+    status = serializers.CharField(source="get_status_display")
+
+    class Meta:
+        model = models.PoolJob
+        fields = ["id", "tournament", "status", "progress", "max_pool_size", "result", "error", "created", "finished"]
+
+
+class JudgeScoreSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Score
+        fields = ["technique_score", "presentation_score"]
+        extra_kwargs = {
+            "technique_score": {"min_value": 0},
+            "presentation_score": {"min_value": 0},
+        }
+
+
+class FormScoresSerializer(serializers.Serializer):
+    scores = JudgeScoreSerializer(many=True, allow_empty=False)
+
+
+class TurnFormScoresSerializer(FormScoresSerializer):
+    form = serializers.IntegerField()
+
+
+class TurnScoresSerializer(serializers.Serializer):
+    forms = TurnFormScoresSerializer(many=True, allow_empty=False)
+
+
+class StandingSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    rank = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = models.Standing
+        fields = ["rank", "team", "turn", "round", "pool", "technique_score", "presentation_score", "total_score",
+                  "score_count"]
+
+
+class RegistrationParticipantSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Participant
+        fields = ["name", "belt_grade", "sex", "birthdate"]
+
+    def validate_belt_grade(self, belt_grade: str) -> str:
+        return validate_allowed_belt_grade(belt_grade, self.context.get("ruleset", DEFAULT_RULESET))
+
+
+class RegistrationTeamSerializer(serializers.Serializer):
+    participants = RegistrationParticipantSerializer(many=True, allow_empty=False)
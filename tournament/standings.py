@@ -0,0 +1,121 @@
+from typing import Iterable, List, Optional
+
+from django.db.models import Count, F, QuerySet, Subquery, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tournament import models
+
+
+def apply_score_delta(form_id: int, technique_delta: int, presentation_delta: int, count_delta: int) -> None:
+    """ Adds score deltas to the standing of the turn that a form belongs to, creating the standing if needed. """
+    deltas = {
+        "technique_score": F("technique_score") + technique_delta,
+        "presentation_score": F("presentation_score") + presentation_delta,
+        "total_score": F("total_score") + technique_delta + presentation_delta,
+        "score_count": F("score_count") + count_delta,
+    }
+    if models.Standing.objects.filter(turn__forms=form_id).update(**deltas) or count_delta < 0:
+        return
+    turn = models.Turn.objects.select_related("round").get(forms=form_id)
+    _, created = models.Standing.objects.get_or_create(
+        turn=turn,
+        defaults={
+            "round_id": turn.round_id,
+            "pool_id": turn.round.pool_id,
+            "team_id": turn.team_id,
+            "technique_score": technique_delta,
+            "presentation_score": presentation_delta,
+            "total_score": technique_delta + presentation_delta,
+            "score_count": count_delta,
+        },
+    )
+    if not created:
+        models.Standing.objects.filter(turn=turn).update(**deltas)
+
+
+def rebuild_standings(round_ids: Iterable[int]) -> None:
+    """ Recomputes the standings of whole rounds in a fixed number of queries, for scores written in bulk. """
+    round_ids = list(round_ids)
+    turns = models.Turn.objects.filter(round_id__in=round_ids, forms__scores__isnull=False).annotate(
+        technique=Sum("forms__scores__technique_score"),
+        presentation=Sum("forms__scores__presentation_score"),
+        count=Count("forms__scores"),
+        pool_id=F("round__pool_id"),
+    )
+    models.Standing.objects.filter(round_id__in=round_ids).delete()
+    models.Standing.objects.bulk_create([
+        models.Standing(
+            turn_id=turn.pk,
+            round_id=turn.round_id,
+            pool_id=turn.pool_id,
+            team_id=turn.team_id,
+            technique_score=turn.technique,
+            presentation_score=turn.presentation,
+            total_score=turn.technique + turn.presentation,
+            score_count=turn.count,
+        )
+        for turn in turns
+    ])
+
+
+@receiver(post_save, sender=models.Score)
+def score_saved(sender, instance: models.Score, created: bool, raw: bool = False, **kwargs):
+    if raw:
+        return
+    old_form_id, old_technique, old_presentation = getattr(instance, "_stored_values", (None, None, None))
+    if not created and old_form_id is not None:
+        if old_form_id == instance.form_id:
+            apply_score_delta(
+                instance.form_id,
+                instance.technique_score - old_technique,
+                instance.presentation_score - old_presentation,
+                0,
+            )
+            instance.remember_stored_values()
+            return
+        apply_score_delta(old_form_id, -old_technique, -old_presentation, -1)
+    apply_score_delta(instance.form_id, instance.technique_score, instance.presentation_score, 1)
+    instance.remember_stored_values()
+
+
+@receiver(post_delete, sender=models.Score)
+def score_deleted(sender, instance: models.Score, **kwargs):
+    # Deletes send post_delete inside the collector's transaction, so the delta is applied atomically.
+    apply_score_delta(instance.form_id, -instance.technique_score, -instance.presentation_score, -1)
+
+
+@receiver(post_save, sender=models.Turn)
+def turn_saved(sender, instance: models.Turn, created: bool, raw: bool = False, **kwargs):
+    if created or raw:
+        return
+    models.Standing.objects.filter(turn=instance).update(
+        round_id=instance.round_id,
+        pool_id=Subquery(models.Round.objects.filter(pk=instance.round_id).values("pool_id")[:1]),
+        team_id=instance.team_id,
+    )
+
+
+def ranked(standings: QuerySet) -> List[models.Standing]:
+    """ Evaluates ordered standings and sets `rank` on each, giving tied totals the same rank. """
+    result = list(standings)
+    previous_total: Optional[int] = None
+    rank = 0
+    for position, standing in enumerate(result, start=1):
+        if standing.total_score != previous_total:
+            rank = position
+            previous_total = standing.total_score
+        standing.rank = rank
+    return result
+
+
+def round_standings(round_id: int) -> List[models.Standing]:
+    return ranked(models.Standing.objects.filter(round_id=round_id).order_by("-total_score", "turn_id"))
+
+
+def pool_standings(pool_id: int) -> List[models.Standing]:
+    """ Ranks the standings of the latest round of a pool, in one query. """
+    latest_round = models.Round.objects.filter(pool_id=pool_id).order_by("-round_number").values("pk")[:1]
+    return ranked(
+        models.Standing.objects.filter(pool_id=pool_id, round_id=latest_round).order_by("-total_score", "turn_id")
+    )
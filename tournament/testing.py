@@ -0,0 +1,26 @@
+from django.urls import reverse
+
+from tournament.profiling import RequestProfile
+
+
+class QueryBudgetMixin:
+    """ Test case helpers that check responses against the `query_budget` declared by their view. """
+
+    def assertWithinQueryBudget(self, response, budget: int = None) -> RequestProfile:
+        """ Fails when the request behind `response` made more queries than `budget`, or than its view declares. """
+        profile: RequestProfile = getattr(response, "profile", None)
+        if profile is None:
+            self.fail("The response has no profile. Is tournament.profiling.ProfilingMiddleware enabled?")
+        budget = profile.query_budget if budget is None else budget
+        if budget is None:
+            self.fail(f"{profile.url_name} declares no query budget for this method.")
+        self.assertLessEqual(
+            profile.queries, budget, msg=f"{profile.url_name} made {profile.queries} queries, over its budget.",
+        )
+        return profile
+
+    def get_within_budget(self, url_name: str, *args, data: dict = None, budget: int = None):
+        response = self.client.get(reverse(url_name, args=args), data)
+        self.assertEqual(response.status_code, 200, msg=response.content)
+        self.assertWithinQueryBudget(response, budget)
+        return response
@@ -1,9 +1,31 @@
-from datetime import datetime
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Tuple
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Count
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from tournament import models
+from tournament import models, serializers, views
+from tournament.benchmarks import run_benchmarks
+from tournament.generation import GenerationParameters, generate_results, generate_tournament
+from tournament.importing import NDJSON_FORMAT, ImportFailed, import_registrations
+from tournament.leaderboards import round_leaderboard
+from tournament.live import broker, event_stream, pool_channel, tournament_channel
+from tournament.mats import TimeEstimate, plan_mats, replan_mats
+from tournament.profiling import metrics
+from tournament.routing import PRIMARY_PIN_COOKIE, replica_reads
+from tournament.rules import CompetitionClass, age_group, age_on, compile_ruleset, deal, make_pools, tournament_ruleset
+from tournament.schedule import advance_rounds, make_first_rounds
+from tournament.testing import QueryBudgetMixin
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -95,6 +117,970 @@ class EndToEndTest(APITestCase):
         self.assertEqual(tournament_teams.first().participants.count(), 2)
 
 
+class TestBulkRegistration(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+
+    def participant(self, name: str, belt_grade: str = models.Participant.BeltGrades.White) -> dict:
+        return {
+            "name": name,
+            "belt_grade": belt_grade,
+            "sex": models.Participant.Sexes.Female,
+            "birthdate": datetime.today().strftime("%Y-%m-%d"),
+        }
+
+    def test_register_teams_with_invalid_row(self):
+        url = reverse('register-teams', args=[self.tournament.id])
+        data = [
+            {"participants": [self.participant("Alice")]},
+            {"participants": [self.participant("Bob", belt_grade="XX")]},
+            {"participants": [self.participant("Christine"), self.participant("Dennis")]},
+        ]
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        body = response.json()
+        self.assertEqual([row["index"] for row in body["created"]], [0, 2])
+        self.assertEqual([row["index"] for row in body["errors"]], [1])
+        self.assertEqual(len(body["created"][1]["participants"]), 2)
+        self.assertEqual(self.tournament.teams.count(), 2)
+        self.assertEqual(models.Participant.objects.filter(team__tournament=self.tournament).count(), 3)
+
+    def test_register_teams_all_invalid(self):
+        url = reverse('register-teams', args=[self.tournament.id])
+        response = self.client.post(url, [{"participants": []}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.tournament.teams.count(), 0)
+
+
+class TestRegistrationImport(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+
+    def test_import_csv_upload(self):
+        content = (
+            "team,name,belt_grade,sex,birthdate\n"
+            "1,Alice,WH,F,2000-01-01\n"
+            "2,Bob,XX,M,2000-01-01\n"
+            "3,Christine,YE,F,2000-01-01\n"
+            "3,Dennis,GR,M,2000-01-01\n"
+        )
+        upload = SimpleUploadedFile("registrations.csv", content.encode("utf-8"))
+        url = reverse('import-registrations', args=[self.tournament.id])
+        response = self.client.post(url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        body = response.json()
+        self.assertEqual(body["teams"], 2)
+        self.assertEqual(body["participants"], 3)
+        self.assertEqual(body["rejected_teams"], 1)
+        self.assertEqual(body["errors"][0]["rows"], [2])
+        self.assertEqual(self.tournament.teams.count(), 2)
+
+    def test_import_ndjson_in_chunks(self):
+        lines = [
+            f'{{"team": "{i}", "name": "P{i}", "belt_grade": "BL", "sex": "M", "birthdate": "1990-05-05"}}\n'
+            for i in range(5)
+        ]
+        reported = []
+        progress = import_registrations(self.tournament, lines, NDJSON_FORMAT, chunk_size=2,
+                                        on_progress=lambda p: reported.append(p.teams))
+        self.assertEqual(progress.chunks, 3)
+        self.assertEqual(reported, [2, 4, 5])
+        self.assertEqual(self.tournament.teams.count(), 5)
+
+    def test_import_fails_after_first_chunk(self):
+        lines = [
+            f'{{"team": "{i}", "name": "P{i}", "belt_grade": "BL", "sex": "M", "birthdate": "1990-05-05"}}\n'
+            for i in range(3)
+        ] + ['{"team": "3", "name": \n']
+        with self.assertRaises(ImportFailed) as context:
+            import_registrations(self.tournament, lines, NDJSON_FORMAT, chunk_size=2)
+        self.assertEqual(context.exception.line, 4)
+        self.assertEqual(context.exception.progress.teams, 2)
+        self.assertEqual(self.tournament.teams.count(), 2)
+
+    def test_import_rejects_rows_that_are_not_objects(self):
+        content = (
+            '[1, 2]\n"Alice"\n'
+            '{"team": "1", "name": "Bob", "belt_grade": "WH", "sex": "M", "birthdate": "2000-01-01"}\n'
+        )
+        upload = SimpleUploadedFile("registrations.ndjson", content.encode("utf-8"))
+        url = reverse('import-registrations', args=[self.tournament.id])
+        response = self.client.post(url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        body = response.json()
+        self.assertEqual(body["teams"], 1)
+        self.assertEqual(body["rejected_teams"], 1)
+        self.assertEqual(body["errors"][0]["rows"], [1, 2])
+
+    def test_import_reports_unreadable_line(self):
+        content = '{"team": "1", "name": "Bob", "belt_grade": "WH", "sex": "M", "birthdate": "2000-01-01"}\n{oops\n'
+        upload = SimpleUploadedFile("registrations.ndjson", content.encode("utf-8"))
+        url = reverse('import-registrations', args=[self.tournament.id])
+        response = self.client.post(url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["line"], 2)
+        self.assertEqual(response.json()["imported"]["teams"], 0)
+
+
+class TestResultsExport(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+        pool = models.Pool.objects.create(tournament=self.tournament, pool_type=models.Pool.PoolType.Solo)
+        round_obj = models.Round.objects.create(pool=pool, round_number=1)
+        for turn_order in range(3):
+            team = models.Team.objects.create(tournament=self.tournament, pool=pool)
+            models.Participant.objects.create(team=team, name=f"P{turn_order}", belt_grade="WH", sex="F",
+                                              birthdate=datetime.today())
+            turn = models.Turn.objects.create(round=round_obj, turn_order=turn_order, team=team)
+            form = models.Form.objects.create(turn=turn)
+            for judge in range(3):
+                models.Score.objects.create(form=form, technique_score=judge + 5, presentation_score=judge + 4)
+
+    def export(self, export_format: str) -> str:
+        response = self.client.get(reverse('export-results', args=[self.tournament.id, export_format]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as context:
+            content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(len(context.captured_queries), 2)
+        return content
+
+    def test_export_csv(self):
+        lines = self.export("csv").splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["pool", "pool_type", "round"])
+        self.assertEqual(len(lines), 10)
+        self.assertIn("P0", lines[1])
+
+    def test_export_ndjson(self):
+        rows = [json.loads(line) for line in self.export("ndjson").splitlines()]
+        self.assertEqual(len(rows), 9)
+        self.assertEqual([row["turn_order"] for row in rows[::3]], [0, 1, 2])
+        self.assertEqual(rows[0]["participants"], ["P0"])
+
+    def test_export_unknown_format(self):
+        response = self.client.get(reverse('export-results', args=[self.tournament.id, "xml"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestStandings(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+        self.pool = models.Pool.objects.create(tournament=tournament, pool_type=models.Pool.PoolType.Solo)
+        self.round = models.Round.objects.create(pool=self.pool, round_number=1)
+        self.forms = []
+        for turn_order in range(3):
+            team = models.Team.objects.create(tournament=tournament, pool=self.pool)
+            turn = models.Turn.objects.create(round=self.round, turn_order=turn_order, team=team)
+            self.forms.append(models.Form.objects.create(turn=turn))
+
+    def score(self, form: models.Form, technique: int, presentation: int) -> dict:
+        response = self.client.post(
+            reverse("score-list"),
+            {"form": form.id, "technique_score": technique, "presentation_score": presentation},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()
+
+    def standings(self, url: str, pk: int) -> list:
+        response = self.client.get(reverse(url, args=[pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_standings_follow_score_changes(self):
+        self.score(self.forms[0], 5, 5)
+        low = self.score(self.forms[1], 3, 3)
+        self.score(self.forms[1], 4, 4)
+        self.score(self.forms[2], 5, 5)
+
+        standings = self.standings("round-standings", self.round.id)
+        self.assertEqual([row["total_score"] for row in standings], [14, 10, 10])
+        self.assertEqual([row["rank"] for row in standings], [1, 2, 2])
+        self.assertEqual(standings[0]["score_count"], 2)
+
+        response = self.client.patch(reverse("score-detail", args=[low["id"]]), {"technique_score": 9})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.standings("pool-standings", self.pool.id)[0]["total_score"], 20)
+
+        response = self.client.delete(reverse("score-detail", args=[low["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        standings = self.standings("round-standings", self.round.id)
+        self.assertEqual([row["total_score"] for row in standings], [10, 10, 8])
+        self.assertEqual(standings[2]["score_count"], 1)
+
+        self.forms[2].delete()
+        self.assertEqual(len(self.standings("round-standings", self.round.id)), 3)
+        self.assertEqual(models.Standing.objects.get(turn=self.forms[2].turn).score_count, 0)
+
+    def test_batched_form_scores(self):
+        judges = [(5, 3), (6, 6), (3, 2), (5, 5), (9, 9)]
+        scores = [{"technique_score": technique, "presentation_score": presentation} for technique, presentation in
+                  judges]
+        url = reverse("form-scores", args=[self.forms[0].id])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, {"scores": scores}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        result = response.json()
+        self.assertEqual(result["score_count"], 5)
+        self.assertEqual(result["total_score"], 53)
+        self.assertEqual(result["trimmed_mean"], 10.0)
+        # One query more than before the change log, which records the scores with one insert.
+        self.assertLess(len(context.captured_queries), 16)
+        self.assertEqual(self.standings("round-standings", self.round.id)[0]["total_score"], 53)
+
+        response = self.client.post(
+            url,
+            {"scores": scores[:1] + [{"technique_score": -1, "presentation_score": 2}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(models.Score.objects.filter(form=self.forms[0]).count(), 5)
+
+    def test_batched_turn_scores(self):
+        turn = self.forms[1].turn
+        second_form = models.Form.objects.create(turn=turn)
+        url = reverse("turn-scores", args=[turn.id])
+        response = self.client.post(url, {"forms": [
+            {"form": self.forms[1].id, "scores": [{"technique_score": 4, "presentation_score": 4}]},
+            {"form": self.forms[2].id, "scores": [{"technique_score": 4, "presentation_score": 4}]},
+        ]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(url, {"forms": [
+            {"form": self.forms[1].id, "scores": [{"technique_score": 4, "presentation_score": 4}]},
+            {"form": second_form.id, "scores": [{"technique_score": 2, "presentation_score": 1}] * 2},
+        ]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([form["total_score"] for form in response.json()["forms"]], [8, 6])
+        standing = models.Standing.objects.get(turn=turn)
+        self.assertEqual((standing.total_score, standing.score_count), (14, 3))
+
+
+class TestLeaderboards(QueryBudgetMixin, APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+        self.pool = models.Pool.objects.create(
+            tournament=self.tournament, pool_type=models.Pool.PoolType.Solo, class_level=1,
+        )
+        self.round = models.Round.objects.create(pool=self.pool, round_number=1)
+        # The judge totals of the forms of every turn. The outlier of the first team is trimmed away, the last team
+        # wins on the sum of the trimmed means of its two forms, and the two teams in between tie.
+        self.teams = [
+            self.make_turn(self.pool, self.round, 1, [[10, 10, 10, 30]]),
+            self.make_turn(self.pool, self.round, 2, [[12, 12, 12]]),
+            self.make_turn(self.pool, self.round, 3, [[12, 12, 12]]),
+            self.make_turn(self.pool, self.round, 4, [[8, 9], [20, 20, 20]]),
+        ]
+
+    def make_turn(self, pool: models.Pool, round_obj: models.Round, turn_order: int, forms: list) -> int:
+        team = models.Team.objects.create(tournament=self.tournament, pool=pool)
+        turn = models.Turn.objects.create(round=round_obj, turn_order=turn_order, team=team)
+        for totals in forms:
+            form = models.Form.objects.create(turn=turn)
+            models.Score.objects.bulk_create([
+                models.Score(form=form, technique_score=total // 2, presentation_score=total - total // 2)
+                for total in totals
+            ])
+        return team.id
+
+    def test_round_leaderboard(self):
+        rows = self.get_within_budget("round-leaderboard", self.round.id).json()
+        self.assertEqual([row["team"] for row in rows], [self.teams[3], self.teams[1], self.teams[2], self.teams[0]])
+        self.assertEqual([row["rank"] for row in rows], [1, 2, 2, 4])
+        self.assertEqual([row["trimmed_score"] for row in rows], [28.5, 12.0, 12.0, 10.0])
+        self.assertEqual([row["total_score"] for row in rows], [77, 36, 36, 60])
+        self.assertEqual(rows[0]["score_count"], 5)
+
+        # Ties share the last place of the top.
+        rows = self.get_within_budget("round-leaderboard", self.round.id, data={"top": 2}).json()
+        self.assertEqual([row["rank"] for row in rows], [1, 2, 2])
+        response = self.client.get(reverse("round-leaderboard", args=[self.round.id]), {"top": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pool_leaderboard_uses_latest_round(self):
+        final = models.Round.objects.create(pool=self.pool, round_number=2)
+        for turn_order, team_id in enumerate([self.teams[1], self.teams[3]], start=1):
+            models.Turn.objects.create(round=final, turn_order=turn_order, team_id=team_id)
+        rows = self.get_within_budget("pool-leaderboard", self.pool.id).json()
+        self.assertEqual([(row["team"], row["rank"], row["score_count"]) for row in rows],
+                         [(self.teams[1], 1, 0), (self.teams[3], 1, 0)])
+
+    def test_class_leaderboard(self):
+        pairs = models.Pool.objects.create(
+            tournament=self.tournament, pool_type=models.Pool.PoolType.Pair, class_level=1,
+        )
+        pair_team = self.make_turn(pairs, models.Round.objects.create(pool=pairs, round_number=1), 1, [[5, 5, 5]])
+        other_class = models.Pool.objects.create(
+            tournament=self.tournament, pool_type=models.Pool.PoolType.Solo, class_level=2,
+        )
+        self.make_turn(other_class, models.Round.objects.create(pool=other_class, round_number=1), 1, [[50, 50, 50]])
+
+        rows = self.get_within_budget("class-leaderboard", self.tournament.id, data={"class_level": 1, "top": 1})
+        rows = rows.json()
+        self.assertEqual([(row["pool_type"], row["team"], row["rank"]) for row in rows],
+                         [("P", pair_team, 1), ("S", self.teams[3], 1)])
+        rows = self.client.get(
+            reverse("class-leaderboard", args=[self.tournament.id]), {"class_level": 1, "pool_type": "S"},
+        ).json()
+        self.assertEqual([row["team"] for row in rows], [self.teams[3], self.teams[1], self.teams[2], self.teams[0]])
+        response = self.client.get(reverse("class-leaderboard", args=[self.tournament.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestLiveUpdates(APITestCase):
+    def setUp(self) -> None:
+        self.tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+        self.pool = models.Pool.objects.create(tournament=self.tournament, pool_type=models.Pool.PoolType.Solo)
+        self.round = models.Round.objects.create(pool=self.pool, round_number=1)
+        self.team = models.Team.objects.create(tournament=self.tournament, pool=self.pool)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def receive(self, subscription) -> dict:
+        return json.loads(self.loop.run_until_complete(asyncio.wait_for(subscription.get(), 1)))
+
+    def test_changes_fan_out_to_subscribers(self):
+        subscriptions = [broker.subscribe([tournament_channel(self.tournament.id)], loop=self.loop) for _ in range(50)]
+        pool_subscription = broker.subscribe([pool_channel(self.pool.id)], loop=self.loop)
+        other_subscription = broker.subscribe([pool_channel(self.pool.id + 1)], loop=self.loop)
+        for subscription in subscriptions + [pool_subscription, other_subscription]:
+            self.addCleanup(subscription.close)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            turn = models.Turn.objects.create(round=self.round, turn_order=1, team=self.team)
+            form = models.Form.objects.create(turn=turn)
+        with self.captureOnCommitCallbacks(execute=True):
+            score = models.Score.objects.create(form=form, technique_score=6, presentation_score=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            score.delete()
+
+        for subscription in subscriptions + [pool_subscription]:
+            self.assertEqual(self.receive(subscription)["type"], "turn")
+            message = self.receive(subscription)
+            self.assertEqual((message["type"], message["action"], message["turn"]), ("score", "saved", turn.id))
+            self.assertEqual(self.receive(subscription)["action"], "deleted")
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertTrue(other_subscription.queue.empty())
+
+    def test_generated_turns_are_published(self):
+        tournament = models.Tournament.objects.create(name="Scheduled", tournament_start=datetime.now())
+        pool = models.Pool.objects.create(tournament=tournament, pool_type=models.Pool.PoolType.Solo)
+        teams = [models.Team.objects.create(tournament=tournament, pool=pool) for _ in range(3)]
+        subscription = broker.subscribe([pool_channel(pool.id)], loop=self.loop)
+        self.addCleanup(subscription.close)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            [(first_round, turns)] = make_first_rounds(tournament)
+
+        messages = [self.receive(subscription) for _ in turns]
+        self.assertEqual([(message["type"], message["action"], message["round"]) for message in messages],
+                         [("turn", "saved", first_round.id)] * len(teams))
+        self.assertEqual([message["id"] for message in messages], [turn.id for turn in turns])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            [(next_round, advanced)] = advance_rounds(models.Round.objects.filter(pk=first_round.pk), 2)
+
+        messages = [self.receive(subscription) for _ in advanced]
+        self.assertEqual([(message["type"], message["round"]) for message in messages], [("turn", next_round.id)] * 2)
+        self.assertEqual([message["team"] for message in messages], [turn.team_id for turn in advanced])
+
+    def test_live_requires_authentication(self):
+        response = self.client.get(reverse("tournament-live", args=[self.tournament.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_live_requires_asgi(self):
+        User.objects.create_superuser("admin", "email@example.com", "admin")
+        self.client.login(username="admin", password="admin")
+        response = self.client.get(reverse("tournament-live", args=[self.tournament.id]))
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    async def test_live_streams_over_asgi(self):
+        await sync_to_async(User.objects.create_user)("viewer", "email@example.com", "viewer")
+        credentials = base64.b64encode(b"viewer:viewer").decode("ascii")
+        response = await AsyncClient().get(reverse("pool-live", args=[self.pool.id]),
+                                           headers={"Authorization": f"Basic {credentials}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+    async def test_stream_subscribes_while_read(self):
+        stream = event_stream([pool_channel(self.pool.id)])
+        self.assertFalse(broker.has_subscribers())
+        self.assertEqual(await stream.__anext__(), "retry: 3000\n\n")
+        self.assertTrue(broker.has_subscribers())
+        await stream.aclose()
+        self.assertFalse(broker.has_subscribers())
+
+    async def test_stream_ends_after_its_lifetime(self):
+        stream = event_stream([pool_channel(self.pool.id)], max_seconds=0.05)
+        self.assertEqual([event async for event in stream], ["retry: 3000\n\n", ": keepalive\n\n"])
+        self.assertFalse(broker.has_subscribers())
+
+    def test_publish_drops_subscriptions_of_closed_loops(self):
+        loop = asyncio.new_event_loop()
+        subscription = broker.subscribe([pool_channel(self.pool.id)], loop=loop)
+        self.addCleanup(subscription.close)
+        loop.close()
+        broker.publish([pool_channel(self.pool.id)], {"type": "turn"})
+        self.assertFalse(broker.has_subscribers())
+
+
+class TestChangeFeed(QueryBudgetMixin, APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+        self.pool = models.Pool.objects.create(tournament=self.tournament, pool_type=models.Pool.PoolType.Solo)
+        self.round = models.Round.objects.create(pool=self.pool, round_number=1)
+        team = models.Team.objects.create(tournament=self.tournament, pool=self.pool)
+        self.turn = models.Turn.objects.create(round=self.round, turn_order=1, team=team)
+        self.form = models.Form.objects.create(turn=self.turn)
+
+    def changes(self, since: int, **params) -> dict:
+        return self.get_within_budget("tournament-changes", self.tournament.id, data={"since": since, **params}).json()
+
+    def test_changes_since(self):
+        start = self.changes(0)["last"]
+        self.assertEqual(self.changes(start), {"fields": ["seq", "action", "model", "id", "data"], "changes": [],
+                                               "last": start, "more": False})
+
+        score = self.client.post(
+            reverse("score-list"), {"form": self.form.id, "technique_score": 4, "presentation_score": 5},
+        ).json()
+        self.client.patch(reverse("score-detail", args=[score["id"]]), {"technique_score": 6})
+        response = self.client.post(reverse("form-scores", args=[self.form.id]), {"scores": [
+            {"technique_score": 1, "presentation_score": 2}, {"technique_score": 3, "presentation_score": 4},
+        ]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.delete(reverse("score-detail", args=[score["id"]]))
+
+        page = self.changes(start, limit=3)
+        self.assertTrue(page["more"])
+        self.assertEqual([change[1:4] for change in page["changes"]], [
+            ["c", "score", score["id"]], ["u", "score", score["id"]], ["c", "score", score["id"] + 1],
+        ])
+        self.assertEqual(page["changes"][1][4], {"form": self.form.id, "technique_score": 6, "presentation_score": 5})
+        page = self.changes(page["last"], limit=3)
+        self.assertFalse(page["more"])
+        self.assertEqual([change[1:4] for change in page["changes"]], [
+            ["c", "score", score["id"] + 2], ["d", "score", score["id"]],
+        ])
+        self.assertIsNone(page["changes"][1][4])
+
+    def test_bulk_writes_and_cascades(self):
+        start = self.changes(0)["last"]
+        response = self.client.post(reverse("advance-round", args=[self.round.id]), {"advance": 1})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["rounds"], [])
+        second_team = models.Team.objects.create(tournament=self.tournament, pool=self.pool)
+        models.Turn.objects.create(round=self.round, turn_order=2, team=second_team)
+        next_round = self.client.post(reverse("advance-round", args=[self.round.id]), {"advance": 1}).json()
+        next_round_id = next_round["rounds"][0]["id"]
+
+        changes = self.changes(start)["changes"]
+        self.assertEqual([change[1:4] for change in changes[2:]], [
+            ["c", "round", next_round_id],
+            ["c", "turn", models.Turn.objects.get(round_id=next_round_id).id],
+            ["u", "round", self.round.id],
+        ])
+        self.assertIsNotNone(changes[-1][4]["closed"])
+
+        # A deleted team takes its turns along, which are listed under their round. Their forms are not listed.
+        models.Form.objects.create(turn=models.Turn.objects.get(round=self.round, team=second_team))
+        turn_ids = list(models.Turn.objects.filter(team=second_team).values_list("pk", flat=True))
+        last = self.changes(start)["last"]
+        self.client.delete(reverse("team-detail", args=[second_team.id]))
+        self.assertCountEqual([change[1:4] for change in self.changes(last)["changes"]],
+                              [["d", "turn", turn_id] for turn_id in turn_ids] + [["d", "team", second_team.id]])
+
+        # A deleted pool takes its teams along, which are listed under the tournament. Its rounds and turns are not.
+        last = self.changes(last)["last"]
+        self.client.delete(reverse("pool-detail", args=[self.pool.id]))
+        self.assertCountEqual([change[1:4] for change in self.changes(last)["changes"]], [
+            ["d", "team", self.turn.team_id], ["d", "pool", self.pool.id],
+        ])
+        self.assertEqual(self.client.get(reverse("tournament-changes", args=[0])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+
+class TestBatchWrites(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+        pool = models.Pool.objects.create(tournament=tournament, pool_type=models.Pool.PoolType.Solo)
+        self.round = models.Round.objects.create(pool=pool, round_number=1)
+        self.team = models.Team.objects.create(tournament=tournament, pool=pool)
+        self.form = models.Form.objects.create(
+            turn=models.Turn.objects.create(round=self.round, turn_order=1, team=self.team),
+        )
+
+    def batch(self, *operations: dict):
+        return self.client.post(reverse("batch-write"), {"operations": list(operations)}, format="json")
+
+    def test_retries_are_replayed(self):
+        operations = [
+            {"key": "turn-2", "action": "create", "model": "turn",
+             "data": {"round": self.round.id, "turn_order": 2, "team": self.team.id}},
+            {"key": "score-1", "action": "create", "model": "score",
+             "data": {"form": self.form.id, "technique_score": 4, "presentation_score": 5}},
+        ]
+        response = self.batch(*operations)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()["results"]
+        self.assertEqual([(result["status"], result["replayed"]) for result in results], [(201, False), (201, False)])
+        score_id = results[1]["data"]["id"]
+
+        operations.append({"key": "score-1-fix", "action": "update", "model": "score", "id": score_id,
+                           "data": {"technique_score": 6}})
+        retried = self.batch(*operations).json()["results"]
+        self.assertEqual(retried[:2], [dict(result, replayed=True) for result in results])
+        self.assertEqual((retried[2]["status"], retried[2]["data"]["technique_score"]), (200, 6))
+        self.assertEqual(models.Turn.objects.filter(round=self.round).count(), 2)
+        self.assertEqual(models.Score.objects.filter(form=self.form).count(), 1)
+        self.assertEqual(models.Standing.objects.get(turn=self.form.turn).total_score, 11)
+
+        response = self.batch({"key": "score-1", "action": "delete", "model": "score", "id": score_id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("key", response.json()["operations"][0])
+
+    def test_failed_batches_roll_back(self):
+        response = self.batch(
+            {"key": "score-1", "action": "create", "model": "score",
+             "data": {"form": self.form.id, "technique_score": 4, "presentation_score": 5}},
+            {"key": "turn-1", "action": "create", "model": "turn",
+             "data": {"round": self.round.id, "turn_order": 1, "team": self.team.id}},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["operations"][0], {})
+        self.assertFalse(models.Score.objects.exists())
+        self.assertFalse(models.IdempotencyKey.objects.exists())
+        response = self.batch({"key": "missing", "action": "delete", "model": "form", "id": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_keys_are_purged(self):
+        operation = {"key": "form-2", "action": "create", "model": "form", "data": {"turn": self.form.turn_id}}
+        self.batch(operation)
+        models.IdempotencyKey.objects.update(created=timezone.now() - timedelta(days=2))
+        with override_settings(TOURNAMENT_IDEMPOTENCY_KEY_SECONDS=24 * 60 * 60):
+            result = self.batch(operation).json()["results"][0]
+        self.assertFalse(result["replayed"])
+        self.assertEqual(models.Form.objects.filter(turn=self.form.turn).count(), 3)
+        self.assertEqual(models.IdempotencyKey.objects.count(), 1)
+
+    def test_keys_belong_to_their_user(self):
+        operation = {"key": "form-2", "action": "create", "model": "form", "data": {"turn": self.form.turn_id}}
+        self.batch(operation)
+        User.objects.create_user("judge", "judge@example.com", "judge")
+        self.client.login(username="judge", password="judge")
+        other = {"key": "form-2", "action": "delete", "model": "form", "id": self.form.id}
+        result = self.batch(other).json()["results"][0]
+        self.assertEqual((result["status"], result["replayed"]), (204, False))
+        self.assertEqual(models.IdempotencyKey.objects.filter(key="form-2").count(), 2)
+
+        self.client.login(username="admin", password="admin")
+        self.assertTrue(self.batch(operation).json()["results"][0]["replayed"])
+
+
+class TestListPagination(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournaments = []
+        for i in range(2):
+            tournament = models.Tournament.objects.create(name=f"Tournament {i}", tournament_start=datetime.now())
+            pool = models.Pool.objects.create(tournament=tournament, pool_type=models.Pool.PoolType.Solo)
+            round_obj = models.Round.objects.create(pool=pool, round_number=1)
+            team = models.Team.objects.create(tournament=tournament, pool=pool)
+            turn = models.Turn.objects.create(round=round_obj, turn_order=1, team=team)
+            form = models.Form.objects.create(turn=turn)
+            for judge in range(5):
+                models.Score.objects.create(form=form, technique_score=judge, presentation_score=judge)
+            self.tournaments.append(tournament)
+
+    def test_filtered_cursor_pages(self):
+        url = reverse("score-list") + f"?tournament={self.tournaments[1].id}&page_size=2"
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            body = response.json()
+            self.assertLessEqual(len(body["results"]), 2)
+            ids.extend(score["id"] for score in body["results"])
+            url = body["next"]
+        expected = models.Score.objects.filter(form__turn__round__pool__tournament=self.tournaments[1])
+        self.assertEqual(ids, sorted(expected.values_list("id", flat=True)))
+
+    def test_invalid_filter(self):
+        response = self.client.get(reverse("turn-list") + "?round=abc")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestTournamentSnapshot(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+
+    def make_tournament(self, pool_amount: int) -> models.Tournament:
+        tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+        for _ in range(pool_amount):
+            pool = models.Pool.objects.create(tournament=tournament, pool_type=models.Pool.PoolType.Solo)
+            round_obj = models.Round.objects.create(pool=pool, round_number=1)
+            for turn_order in range(3):
+                team = models.Team.objects.create(tournament=tournament, pool=pool)
+                models.Participant.objects.create(team=team, name="P", belt_grade="WH", sex="F",
+                                                  birthdate=datetime.today())
+                turn = models.Turn.objects.create(round=round_obj, turn_order=turn_order, team=team)
+                form = models.Form.objects.create(turn=turn)
+                models.Score.objects.create(form=form, technique_score=5, presentation_score=5)
+        return tournament
+
+    def test_snapshot_query_budget(self):
+        for pool_amount in [1, 5]:
+            tournament = self.make_tournament(pool_amount)
+            with self.assertNumQueries(8):
+                snapshot = views.TournamentSnapshot.queryset.get(pk=tournament.pk)
+                data = serializers.TournamentSnapshotSerializer(snapshot).data
+            self.assertEqual(len(data["pools"]), pool_amount)
+            self.assertEqual(data["pools"][0]["rounds"][0]["turns"][2]["forms"][0]["scores"][0]["technique_score"], 5)
+
+    def test_snapshot_endpoint(self):
+        tournament = self.make_tournament(2)
+        response = self.client.get(reverse("tournament-snapshot", args=[tournament.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["pools"][1]["teams"][0]["participants"]), 1)
+
+
+class TestConditionalGet(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+        self.pool = models.Pool.objects.create(tournament=self.tournament, pool_type=models.Pool.PoolType.Solo)
+        self.round = models.Round.objects.create(pool=self.pool, round_number=1)
+        team = models.Team.objects.create(tournament=self.tournament, pool=self.pool)
+        turn = models.Turn.objects.create(round=self.round, turn_order=1, team=team)
+        self.form = models.Form.objects.create(turn=turn)
+
+    def assert_not_modified_until_write(self, url: str):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+        models.Score.objects.create(form=self.form, technique_score=5, presentation_score=5)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_tournament_detail(self):
+        self.assert_not_modified_until_write(reverse("tournament-detail", args=[self.tournament.id]))
+
+    def test_round_detail(self):
+        self.assert_not_modified_until_write(reverse("round-detail", args=[self.round.id]))
+
+    def test_filtered_list(self):
+        self.assert_not_modified_until_write(reverse("score-list") + f"?tournament={self.tournament.id}")
+
+    def test_unfiltered_list(self):
+        self.assert_not_modified_until_write(reverse("pool-list"))
+
+    def test_standings(self):
+        self.assert_not_modified_until_write(reverse("round-standings", args=[self.round.id]))
+        self.assert_not_modified_until_write(reverse("pool-standings", args=[self.pool.id]))
+
+    def test_leaderboards(self):
+        self.assert_not_modified_until_write(reverse("round-leaderboard", args=[self.round.id]))
+        self.assert_not_modified_until_write(reverse("pool-leaderboard", args=[self.pool.id]))
+        self.assert_not_modified_until_write(
+            reverse("class-leaderboard", args=[self.tournament.id]) + "?class_level=1&pool_type=S",
+        )
+
+    def test_other_tournament_unaffected(self):
+        other = models.Tournament.objects.create(name="Other Tournament", tournament_start=datetime.now())
+        url = reverse("tournament-detail", args=[other.id])
+        etag = self.client.get(url)["ETag"]
+        models.Score.objects.create(form=self.form, technique_score=5, presentation_score=5)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_edits_after_child_writes(self):
+        url = reverse("tournament-detail", args=[self.tournament.id])
+        tournament = models.Tournament.objects.get(id=self.tournament.id)
+        models.Score.objects.create(form=self.form, technique_score=5, presentation_score=5)
+        etag = self.client.get(url)["ETag"]
+        # The tournament was loaded before the score bumped the version, and must not write the old version back.
+        tournament.name = "Renamed"
+        tournament.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["name"], "Renamed")
+
+        etag = response["ETag"]
+        models.Score.objects.create(form=self.form, technique_score=5, presentation_score=5)
+        self.assertEqual(self.client.patch(url, {"name": "Renamed again"}).status_code, status.HTTP_200_OK)
+        self.assertNotEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag)["ETag"], etag)
+
+    def test_delete_bumps_once(self):
+        models.Score.objects.create(form=self.form, technique_score=5, presentation_score=5)
+        version = models.Tournament.objects.get(id=self.tournament.id).version
+        self.assertEqual(self.client.delete(reverse("pool-detail", args=[self.pool.id])).status_code,
+                         status.HTTP_204_NO_CONTENT)
+        self.assertEqual(models.Tournament.objects.get(id=self.tournament.id).version, version + 1)
+
+
+class TestBenchmarks(APITestCase):
+    def test_generate_tournament(self):
+        tournament = generate_tournament(GenerationParameters(teams=30, seed=1))
+        self.assertEqual(tournament.teams.count(), 30)
+        self.assertFalse(tournament.teams.filter(participants__isnull=True).exists())
+
+    def test_run_benchmarks(self):
+        report = run_benchmarks(GenerationParameters(teams=20, judges=3, forms_per_turn=1))
+        json.dumps(report)
+        self.assertEqual(report["counts"]["scores"], 20 * 3 + 1)
+        for result in report["results"]:
+            self.assertIn(result["status_code"], [status.HTTP_200_OK, status.HTTP_201_CREATED], msg=result["name"])
+
+
+class TestSchedule(QueryBudgetMixin, APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.parameters = GenerationParameters(teams=60, seed=2)
+        self.tournament = generate_tournament(self.parameters)
+        make_pools(self.tournament)
+
+    def test_make_schedule(self):
+        url = reverse("make-schedule", args=[self.tournament.id])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, {"turn_order": "random", "seed": 7})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLess(len(context.captured_queries), 20)
+        body = response.json()
+        self.assertEqual(body["seed"], 7)
+        self.assertEqual(len(body["rounds"]), self.tournament.pools.count())
+        self.assertEqual(models.Turn.objects.filter(round__pool__tournament=self.tournament).count(), 60)
+        for round_data in body["rounds"]:
+            turns = models.Turn.objects.filter(round_id=round_data["id"]).order_by("turn_order")
+            self.assertEqual([turn.team_id for turn in turns], round_data["teams"])
+            self.assertEqual([turn.turn_order for turn in turns], list(range(1, len(turns) + 1)))
+
+        response = self.client.post(url, {"turn_order": "random", "seed": 7})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["rounds"], [])
+
+    def test_registration_order(self):
+        response = self.client.post(reverse("make-schedule", args=[self.tournament.id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for round_data in response.json()["rounds"]:
+            self.assertEqual(round_data["teams"], sorted(round_data["teams"]))
+
+    def test_advance_all_pools(self):
+        generate_results(self.tournament, self.parameters)
+        first_rounds = list(models.Round.objects.filter(pool__tournament=self.tournament).annotate(
+            turn_count=Count("turns"),
+        ))
+        response = self.client.post(reverse("advance", args=[self.tournament.id]), {"advance": 2})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertWithinQueryBudget(response)
+        next_rounds = {round_data["pool"]: round_data for round_data in response.json()["rounds"]}
+        self.assertTrue(next_rounds)
+        for first_round in first_rounds:
+            if first_round.turn_count <= 2:
+                self.assertNotIn(first_round.pool_id, next_rounds)
+                continue
+            best = [row["team"] for row in round_leaderboard(first_round.id, 2)[:2]]
+            self.assertEqual(next_rounds[first_round.pool_id]["teams"], best[::-1])
+            self.assertEqual(next_rounds[first_round.pool_id]["round_number"], 2)
+            self.assertIsNotNone(models.Round.objects.get(id=first_round.id).closed)
+
+        response = self.client.post(reverse("advance", args=[self.tournament.id]), {"advance": 2})
+        self.assertEqual(response.json()["rounds"], [])
+
+    def test_advance_one_round(self):
+        pool = models.Pool.objects.create(tournament=self.tournament, pool_type=models.Pool.PoolType.Solo)
+        round_obj = models.Round.objects.create(pool=pool, round_number=1)
+        # Judge scores per turn. The first turn has an outlier judge, so its total beats the second turn's, but its
+        # trimmed score does not.
+        scores = [[(5, 5), (5, 5), (10, 10)], [(6, 6), (6, 6), (6, 6)], [(5, 5)], [(9, 9)], [(5, 5)]]
+        for turn_order, judges in enumerate(scores, start=1):
+            team = models.Team.objects.create(tournament=self.tournament, pool=pool)
+            turn = models.Turn.objects.create(round=round_obj, turn_order=turn_order, team=team)
+            form = models.Form.objects.create(turn=turn)
+            for technique, presentation in judges:
+                models.Score.objects.create(form=form, technique_score=technique, presentation_score=presentation)
+        teams = list(models.Turn.objects.filter(round=round_obj).order_by("turn_order").values_list("team", flat=True))
+
+        url = reverse("advance-round", args=[round_obj.id])
+        response = self.client.post(url, {"advance": 3, "turn_order": "rank"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Equal trimmed scores go to the better total, then to the team that performed first, as on the leaderboard.
+        self.assertEqual(response.json()["rounds"][0]["teams"], [teams[3], teams[1], teams[0]])
+        self.assertEqual([row["team"] for row in round_leaderboard(round_obj.id, 3)], [teams[3], teams[1], teams[0]])
+        self.assertEqual(self.client.post(url, {"advance": 3}).json()["rounds"], [])
+        self.assertEqual(self.client.post(url, {"advance": 0}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestMatPlanning(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=timezone.now())
+        self.pools = []
+        for team_amount in [6, 5, 4, 3, 3, 2]:
+            pool = models.Pool.objects.create(tournament=self.tournament, pool_type=models.Pool.PoolType.Solo)
+            for _ in range(team_amount):
+                models.Team.objects.create(tournament=self.tournament, pool=pool)
+            self.pools.append(pool)
+        self.estimate = TimeEstimate(forms_per_turn=1, seconds_per_form=50, seconds_between_turns=10)
+
+    def test_plan_endpoint(self):
+        url = reverse("mat-plan", args=[self.tournament.id])
+        response = self.client.post(url, {"mats": 2, "forms_per_turn": 1, "seconds_per_form": 50,
+                                          "seconds_between_turns": 10})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()), 6)
+        self.assertEqual({row["mat"] for row in response.json()}, {1, 2})
+        response = self.client.get(reverse("mat-plan", args=[self.tournament.id + 1]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_longest_processing_time(self):
+        assignments = plan_mats(self.tournament, 2, self.estimate)
+        ends = {}
+        for assignment in assignments:
+            ends[assignment.mat] = max(ends.get(assignment.mat, assignment.end), assignment.end)
+        start = self.tournament.tournament_start
+        # 23 turns of a minute over two mats: LPT finishes both mats within a turn of each other.
+        self.assertEqual(sorted(end - start for end in ends.values()), [timedelta(minutes=11), timedelta(minutes=12)])
+
+    def test_replan_after_overrun(self):
+        plan_mats(self.tournament, 2, self.estimate)
+        first = models.MatAssignment.objects.get(pool=self.pools[0])
+        now = first.start + timedelta(minutes=1)
+        overrun_end = first.end + timedelta(minutes=30)
+        assignments = replan_mats(self.tournament, now, {self.pools[0].id: overrun_end})
+        self.assertEqual(len(assignments), 6)
+        for assignment in assignments:
+            if assignment.mat == first.mat and assignment.pool_id != self.pools[0].id:
+                self.assertGreaterEqual(assignment.start, overrun_end)
+        self.assertEqual(models.MatAssignment.objects.get(pool=self.pools[0]).end, overrun_end)
+
+    def test_overrun_of_waiting_pool(self):
+        plan_mats(self.tournament, 2, self.estimate)
+        waiting = models.MatAssignment.objects.filter(tournament=self.tournament).order_by("-start").first()
+        response = self.client.post(reverse("pool-overrun", args=[waiting.pool_id]),
+                                    {"end": waiting.end + timedelta(minutes=30)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(models.MatAssignment.objects.get(pk=waiting.pk).end, waiting.end)
+
+    def test_replan_uses_every_mat(self):
+        plan_mats(self.tournament, 2, self.estimate)
+        before_start = self.tournament.tournament_start - timedelta(minutes=1)
+        self.assertEqual({assignment.mat for assignment in replan_mats(self.tournament, before_start)}, {1, 2})
+        assignments = replan_mats(self.tournament, before_start, mats=3)
+        self.assertEqual({assignment.mat for assignment in assignments}, {1, 2, 3})
+
+    def test_replan_on_fewer_mats(self):
+        plan_mats(self.tournament, 2, self.estimate)
+        before_start = self.tournament.tournament_start - timedelta(minutes=1)
+        self.assertEqual({assignment.mat for assignment in replan_mats(self.tournament, before_start, mats=1)}, {1})
+        plan_mats(self.tournament, 2, self.estimate)
+        now = self.tournament.tournament_start + timedelta(seconds=1)
+        with self.assertRaises(ValueError):
+            replan_mats(self.tournament, now, mats=1)
+        self.assertEqual({assignment.mat for assignment in replan_mats(self.tournament, now, mats=2)}, {1, 2})
+
+
+@override_settings(TOURNAMENT_JOBS_EAGER=True)
+class TestPoolJobs(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournament = generate_tournament(GenerationParameters(teams=40, seed=3))
+
+    def test_job_runs_and_reports_result(self):
+        url = reverse("submit-pool-job", args=[self.tournament.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"max_pool_size": 5})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()["status"], "Queued")
+
+        response = self.client.get(reverse("pool-job-detail", args=[response.json()["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        job = response.json()
+        self.assertEqual((job["status"], job["progress"]), ("Succeeded", 100))
+        self.assertEqual(job["result"]["teams"], 40)
+        self.assertFalse(self.tournament.pools.annotate(n=Count("teams")).filter(n__gt=5).exists())
+
+    def test_active_job_is_reused(self):
+        active = models.PoolJob.objects.create(tournament=self.tournament, status=models.PoolJob.Statuses.Running)
+        url = reverse("submit-pool-job", args=[self.tournament.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["id"], active.id)
+        self.assertEqual(self.tournament.pools.count(), 0)
+
+    def test_rerun_keeps_scheduled_pools(self):
+        url = reverse("submit-pool-job", args=[self.tournament.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url)
+        pool_ids = set(self.tournament.pools.values_list("pk", flat=True))
+        scheduled = self.tournament.pools.order_by("pk")[:2]
+        for pool in scheduled:
+            models.Round.objects.create(pool=pool, round_number=1)
+        team = scheduled[0].teams.first()
+        models.Participant.objects.filter(team=team).update(belt_grade=models.Participant.BeltGrades.Dan_1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
+        self.assertEqual(self.client.get(reverse("pool-job-detail", args=[response.json()["id"]])).json()["status"],
+                         "Succeeded")
+        self.assertEqual(set(self.tournament.pools.values_list("pk", flat=True)), pool_ids)
+        self.assertEqual(models.Round.objects.filter(pool__tournament=self.tournament).count(), 2)
+        self.assertEqual(models.Team.objects.get(id=team.id).pool_id, scheduled[0].id)
+
+    def test_make_pools_conflicts_with_active_job(self):
+        active = models.PoolJob.objects.create(tournament=self.tournament, status=models.PoolJob.Statuses.Queued)
+        response = self.client.post(reverse("make-pools", args=[self.tournament.id]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()["job"], active.id)
+        self.assertEqual(self.tournament.pools.count(), 0)
+
+    def test_abandoned_job_is_replaced(self):
+        abandoned = models.PoolJob.objects.create(tournament=self.tournament, status=models.PoolJob.Statuses.Running)
+        models.PoolJob.objects.filter(pk=abandoned.pk).update(updated=timezone.now() - timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("submit-pool-job", args=[self.tournament.id]))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        abandoned.refresh_from_db()
+        self.assertEqual(abandoned.status, models.PoolJob.Statuses.Failed)
+
+
 class TestPoolCreation(APITestCase):
     def setUp(self) -> None:
         superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
@@ -260,3 +1246,441 @@ class TestPoolCreation(APITestCase):
         response = self.client.post(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assert_tournament_pools(tournament["id"], pool_amount=1, teams_per_pool=5, participants_per_team=1)
+
+    def make_pools_queries(self, team_amount: int) -> int:
+        tournament = models.Tournament.objects.create(name="Query Tournament", tournament_start=datetime.now())
+        belt_grades = [grade[0] for grade in models.Participant.BELT_GRADES]
+        sexes = [sex[0] for sex in models.Participant.SEXES]
+        for i in range(team_amount):
+            team = models.Team.objects.create(tournament=tournament)
+            for j in range(i % 4 + 1):
+                models.Participant.objects.create(
+                    team=team,
+                    name=f"Participant {i}-{j}",
+                    belt_grade=belt_grades[(i + j) % len(belt_grades)],
+                    sex=sexes[(i + j) % len(sexes)],
+                    birthdate=datetime.today(),
+                )
+        url = reverse('make-pools', args=[tournament.id])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(models.Team.objects.filter(tournament=tournament, pool__isnull=True).exists())
+        return len(context.captured_queries)
+
+    def test_query_count_independent_of_team_amount(self):
+        self.assertEqual(self.make_pools_queries(8), self.make_pools_queries(80))
+
+    def test_age_group_pools(self):
+        tournament = self.make_tournament()
+        start = models.Tournament.objects.get(id=tournament["id"]).tournament_start.date()
+        for name, age in [("Alice", 7), ("Bob", 8), ("Christine", 10), ("Dennis", 45), ("Eva", 47), ("Frank", 101)]:
+            birthdate = start.replace(year=start.year - age) if (start.month, start.day) != (2, 29) else start
+            self.make_participant(self.make_team(tournament["id"])["id"], name,
+                                  birthdate=birthdate.strftime("%Y-%m-%d"))
+        url = reverse('make-pools', args=[tournament["id"]])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pools = models.Pool.objects.filter(tournament_id=tournament["id"]).order_by("min_age")
+        self.assertEqual([(pool.min_age, pool.max_age) for pool in pools], [(0, 8), (9, 11), (41, 50)])
+        self.assertEqual([pool.teams.count() for pool in pools], [2, 1, 2])
+        # Ages outside every age group get no pool.
+        self.assertEqual(models.Team.objects.get(participants__name="Frank").pool, None)
+
+    def test_age_group_lookup(self):
+        solo = models.Pool.PoolType.Solo
+        self.assertEqual(age_group(solo, 0), (0, 8))
+        self.assertEqual(age_group(solo, 8), (0, 8))
+        self.assertEqual(age_group(solo, 9), (9, 11))
+        self.assertEqual(age_group(solo, 66), (66, 100))
+        self.assertEqual(age_group(models.Pool.PoolType.Pair, 31), (31, 100))
+        self.assertIsNone(age_group(solo, 101))
+        gaps = compile_ruleset([(CompetitionClass("All", "", 1), ["WH"])], {solo: [[3, 11], [14, 17]]})
+        self.assertEqual([gaps.age_group(solo, age) for age in [2, 3, 11, 12, 13, 14, 17, 18]],
+                         [None, (3, 11), (3, 11), None, None, (14, 17), (14, 17), None])
+        self.assertEqual(age_on(datetime(2000, 6, 2).date(), datetime(2020, 6, 1).date()), 19)
+        self.assertEqual(age_on(datetime(2000, 6, 1).date(), datetime(2020, 6, 1).date()), 20)
+
+    def test_teams_without_participants_stay_unassigned(self):
+        tournament = self.make_tournament()
+        self.make_participant(self.make_team(tournament["id"])["id"], "Alice")
+        empty_team = self.make_team(tournament["id"])
+        response = self.client.post(reverse('make-pools', args=[tournament["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["unassigned_teams"], [empty_team["id"]])
+        self.assertIsNone(models.Team.objects.get(id=empty_team["id"]).pool)
+        self.assertEqual(models.Pool.objects.filter(tournament_id=tournament["id"]).count(), 1)
+
+        response = self.client.post(reverse('make-pools', args=[tournament["id"] + 1]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_split_oversized_pools(self):
+        tournament = self.make_tournament()
+        belt_grades = [models.Participant.BeltGrades.Blue, models.Participant.BeltGrades.Red]
+        for i in range(10):
+            self.make_participant(self.make_team(tournament["id"])["id"], f"P{i}", belt_grade=belt_grades[i % 2])
+        url = reverse('make-pools', args=[tournament["id"]])
+        response = self.client.post(url, {"max_pool_size": 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pools = models.Pool.objects.filter(tournament_id=tournament["id"])
+        self.assertEqual(sorted(pool.teams.count() for pool in pools), [3, 3, 4])
+        for pool in pools:
+            self.assertTrue(pool.teams.filter(participants__belt_grade=models.Participant.BeltGrades.Red).exists())
+
+        pool = pools.first()
+        response = self.client.post(reverse('split-pool', args=[pool.id]), {"max_pool_size": 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(models.Pool.objects.filter(tournament_id=tournament["id"]).count(), 3)
+
+        response = self.client.post(reverse('split-pool', args=[pool.id]), {"max_pool_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 2)
+        self.assertEqual(models.Pool.objects.filter(tournament_id=tournament["id"]).count(), 4)
+
+    def test_deal(self):
+        self.assertEqual(deal(list(range(7)), 3), [[0, 5, 6], [1, 4], [2, 3]])
+
+    def test_late_registration_joins_smallest_matching_pool(self):
+        tournament = self.make_tournament()
+        for i in range(5):
+            self.make_participant(self.make_team(tournament["id"])["id"], f"P{i}")
+        self.client.post(reverse('make-pools', args=[tournament["id"]]), {"max_pool_size": 3})
+        pools = models.Pool.objects.filter(tournament_id=tournament["id"])
+        self.assertEqual(sorted(pool.teams.count() for pool in pools.all()), [2, 3])
+        smaller = min(pools.all(), key=lambda pool: pool.teams.count())
+
+        team = self.make_team(tournament["id"])
+        self.make_participant(team["id"], "Late")
+        self.assertEqual(models.Team.objects.get(id=team["id"]).pool_id, smaller.id)
+        self.assertEqual(pools.all().count(), 2)
+
+        # A second participant turns the team into a pair, for which no pool exists yet.
+        self.make_participant(team["id"], "Later", sex=models.Participant.Sexes.Male)
+        pair_pool = models.Team.objects.get(id=team["id"]).pool
+        self.assertEqual(pair_pool.pool_type, models.Pool.PoolType.Pair)
+        self.assertEqual(pools.all().count(), 3)
+
+        # Moving back leaves the pair pool empty, which removes it again.
+        models.Participant.objects.get(team_id=team["id"], name="Later").delete()
+        self.assertEqual(models.Team.objects.get(id=team["id"]).pool_id, smaller.id)
+        self.assertFalse(models.Pool.objects.filter(id=pair_pool.id).exists())
+        models.Participant.objects.get(team_id=team["id"], name="Late").delete()
+        self.assertIsNone(models.Team.objects.get(id=team["id"]).pool)
+
+    def test_late_teams_respect_max_pool_size(self):
+        tournament = self.make_tournament()
+        for i in range(5):
+            self.make_participant(self.make_team(tournament["id"])["id"], f"P{i}")
+        self.client.post(reverse('make-pools', args=[tournament["id"]]), {"max_pool_size": 3})
+        late_teams = models.Team.objects.bulk_create([models.Team(tournament_id=tournament["id"]) for _ in range(3)])
+        models.Participant.objects.bulk_create([models.Participant(
+            team=team, name=f"Late {i}", belt_grade=models.Participant.BeltGrades.White,
+            sex=models.Participant.Sexes.Female, birthdate=datetime.today(),
+        ) for i, team in enumerate(late_teams)])
+
+        response = self.client.post(reverse('assign-pools', args=[tournament["id"]]), {"max_pool_size": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["assigned"]), 3)
+        pools = models.Pool.objects.filter(tournament_id=tournament["id"])
+        self.assertEqual(sorted(pool.teams.count() for pool in pools), [2, 3, 3])
+
+    def test_started_pools_keep_their_teams(self):
+        tournament = self.make_tournament()
+        team = self.make_team(tournament["id"])
+        self.make_participant(team["id"], "Alice")
+        self.client.post(reverse('make-pools', args=[tournament["id"]]))
+        pool_id = models.Team.objects.get(id=team["id"]).pool_id
+        models.Round.objects.create(pool_id=pool_id, round_number=1)
+
+        self.make_participant(team["id"], "Bob", sex=models.Participant.Sexes.Male)
+        participant = models.Participant.objects.get(team_id=team["id"], name="Alice")
+        participant.belt_grade = models.Participant.BeltGrades.Dan_1
+        participant.save()
+        self.assertEqual(models.Team.objects.get(id=team["id"]).pool_id, pool_id)
+
+    def test_assign_pools_endpoint(self):
+        tournament = self.make_tournament()
+        self.make_participant(self.make_team(tournament["id"])["id"], "Alice")
+        self.client.post(reverse('make-pools', args=[tournament["id"]]))
+        manual_pool = models.Pool.objects.create(tournament_id=tournament["id"])
+        manual_team = models.Team.objects.create(tournament_id=tournament["id"], pool=manual_pool)
+        self.make_participant(manual_team.id, "Bob")
+        self.assertEqual(models.Team.objects.get(id=manual_team.id).pool_id, manual_pool.id)
+
+        registered = self.client.post(
+            reverse('register-teams', args=[tournament["id"]]),
+            [{"participants": [{
+                "name": "Dan", "belt_grade": models.Participant.BeltGrades.Dan_1,
+                "sex": models.Participant.Sexes.Male, "birthdate": datetime.today().strftime("%Y-%m-%d"),
+            }]}],
+            format="json",
+        )
+        self.assertEqual(registered.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(models.Team.objects.filter(tournament_id=tournament["id"], pool__isnull=True).exists())
+
+        unassigned = models.Team.objects.create(tournament_id=tournament["id"])
+        models.Participant.objects.bulk_create([models.Participant(
+            team=unassigned, name="Eve", belt_grade=models.Participant.BeltGrades.White,
+            sex=models.Participant.Sexes.Female, birthdate=datetime.today(),
+        )])
+        alice_pool = models.Team.objects.get(participants__name="Alice").pool_id
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('assign-pools', args=[tournament["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"assigned": [{"team": unassigned.id, "pool": alice_pool}]})
+        self.assertLess(len(context.captured_queries), 15)
+
+
+class TestRulesets(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+
+    def make_ruleset(self) -> dict:
+        response = self.client.post(reverse("ruleset-list"), {
+            "name": "Two classes",
+            "classes": [
+                {"level": 1, "name": "Beginners", "belt_grades": ["WH", "WY", "YE"]},
+                {"level": 2, "name": "Advanced", "belt_grades": ["BL", "RE", "1D"]},
+            ],
+            "age_groups": {"S": [[18, 100], [0, 17]]},
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, msg=response.json())
+        return response.json()
+
+    def test_invalid_rulesets(self):
+        url = reverse("ruleset-list")
+        response = self.client.post(url, {
+            "name": "Overlapping",
+            "classes": [{"level": 1, "name": "All", "belt_grades": ["WH"]}],
+            "age_groups": {"S": [[0, 20], [18, 100]]},
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for groups in [[[0, 11], [14, 17]], [[5, 100]]]:
+            response = self.client.post(url, {
+                "name": "Gaps",
+                "classes": [{"level": 1, "name": "All", "belt_grades": ["WH"]}],
+                "age_groups": {"S": groups},
+            }, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {
+            "name": "Duplicate belt",
+            "classes": [
+                {"level": 1, "name": "Low", "belt_grades": ["WH"]},
+                {"level": 2, "name": "High", "belt_grades": ["WH"]},
+            ],
+            "age_groups": {},
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pools_follow_tournament_ruleset(self):
+        ruleset = self.make_ruleset()
+        tournament = models.Tournament.objects.create(
+            name="Federation", tournament_start=datetime.now(), ruleset_id=ruleset["id"],
+        )
+        for name, belt_grade in [("Alice", "WH"), ("Bob", "YE"), ("Christine", "1D")]:
+            team = models.Team.objects.create(tournament=tournament)
+            response = self.client.post(reverse("participant-list"), {
+                "team": team.id, "name": name, "belt_grade": belt_grade, "sex": models.Participant.Sexes.Female,
+                "birthdate": datetime.today().strftime("%Y-%m-%d"),
+            })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse("participant-list"), {
+            "team": team.id, "name": "Dennis", "belt_grade": "GR", "sex": models.Participant.Sexes.Male,
+            "birthdate": datetime.today().strftime("%Y-%m-%d"),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("belt_grade", response.json())
+
+        make_pools(tournament)
+        pools = tournament.pools.order_by("class_level")
+        self.assertEqual([(pool.class_level, pool.min_age, pool.max_age) for pool in pools], [(1, 0, 17), (2, 0, 17)])
+        self.assertEqual([pool.teams.count() for pool in pools], [2, 1])
+
+        response = self.client.delete(reverse("ruleset-detail", args=[ruleset["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_compiled_ruleset_cache(self):
+        ruleset = self.make_ruleset()
+        tournament = models.Tournament.objects.create(
+            name="Federation", tournament_start=datetime.now(), ruleset_id=ruleset["id"],
+        )
+        compiled = tournament_ruleset(tournament.id)
+        with CaptureQueriesContext(connection) as context:
+            self.assertIs(tournament_ruleset(tournament.id), compiled)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(compiled.age_group(models.Pool.PoolType.Solo, 30), (18, 100))
+
+        response = self.client.patch(
+            reverse("ruleset-detail", args=[ruleset["id"]]), {"age_groups": {"S": [[0, 100]]}}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["version"], ruleset["version"] + 1)
+        recompiled = tournament_ruleset(tournament.id)
+        self.assertIsNot(recompiled, compiled)
+        self.assertEqual(recompiled.age_group(models.Pool.PoolType.Solo, 30), (0, 100))
+
+
+@override_settings(TOURNAMENT_READ_REPLICA="replica", TOURNAMENT_PRIMARY_PIN_SECONDS=5)
+class TestReadReplica(APITestCase):
+    """ The replica test database is not kept in sync, so reads show which database served them. """
+    databases = {"default", "replica"}
+
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+
+    def tournament_names(self) -> list:
+        response = self.client.get(reverse("tournament-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [tournament["name"] for tournament in response.json()["results"]]
+
+    def test_safe_requests_read_from_replica(self):
+        models.Tournament.objects.create(name="Primary", tournament_start=datetime.now())
+        models.Tournament.objects.using("replica").create(name="Replica", tournament_start=datetime.now())
+        self.assertEqual(self.tournament_names(), ["Replica"])
+
+        response = self.client.post(
+            reverse("tournament-list"),
+            {"name": "Written", "tournament_start": datetime.now(), "pools": [], "teams": []},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+        self.assertEqual(self.tournament_names(), ["Primary", "Written"])
+
+        del self.client.cookies[PRIMARY_PIN_COOKIE]
+        self.assertEqual(self.tournament_names(), ["Replica"])
+
+    def test_reads_after_write_use_primary(self):
+        models.Tournament.objects.using("replica").create(id=100, name="Replica", tournament_start=datetime.now())
+        with replica_reads("replica"):
+            self.assertEqual(models.Tournament.objects.get().name, "Replica")
+            models.Tournament.objects.create(name="Primary", tournament_start=datetime.now())
+            self.assertEqual(models.Tournament.objects.get().name, "Primary")
+        # Objects read from the replica are saved to the primary.
+        with replica_reads("replica"):
+            replica_tournament = models.Tournament.objects.get()
+        replica_tournament.name = "Copied"
+        replica_tournament.save()
+        self.assertEqual(
+            sorted(models.Tournament.objects.values_list("name", flat=True)), ["Copied", "Primary"],
+        )
+
+
+class TestSparseFieldsets(APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        self.tournament = models.Tournament.objects.create(name="Testing Tournament!", tournament_start=datetime.now())
+        self.pool = models.Pool.objects.create(tournament=self.tournament, pool_type=models.Pool.PoolType.Solo)
+
+    def add_teams(self, amount: int):
+        for i in range(amount):
+            team = models.Team.objects.create(tournament=self.tournament, pool=self.pool)
+            for j in range(2):
+                models.Participant.objects.create(
+                    team=team, name=f"Participant {i}-{j}", belt_grade=models.Participant.BeltGrades.White,
+                    sex=models.Participant.Sexes.Female, birthdate=datetime.today(),
+                )
+
+    def get(self, url: str, params: dict) -> Tuple[dict, int]:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, msg=response.content)
+        return response.json(), len(context.captured_queries)
+
+    def test_fields_and_expand(self):
+        self.add_teams(2)
+        url = reverse("team-list")
+        body, _ = self.get(url, {"fields": "id,pool"})
+        self.assertEqual(body["results"][0], {"id": body["results"][0]["id"], "pool": self.pool.id})
+
+        body, _ = self.get(url, {"fields": "id,pool,participants.name", "expand": "pool,participants"})
+        team = body["results"][0]
+        self.assertEqual(team["pool"]["pool_type"], models.Pool.PoolType.Solo)
+        self.assertEqual(team["participants"], [{"name": "Participant 0-0"}, {"name": "Participant 0-1"}])
+
+        body, _ = self.get(reverse("pool-detail", args=[self.pool.id]), {"expand": "teams.participants"})
+        self.assertEqual(len(body["teams"][1]["participants"]), 2)
+        self.assertEqual(body["tournament"], self.tournament.id)
+
+        self.assertEqual(self.client.get(url, {"fields": "secret"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {"expand": "name"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count_independent_of_page_size(self):
+        url = reverse("team-list")
+        params = [{}, {"fields": "id"}, {"expand": "pool.tournament,participants"}]
+        self.add_teams(2)
+        few = [self.get(url, query)[1] for query in params]
+        self.add_teams(8)
+        many = [self.get(url, query)[1] for query in params]
+        self.assertEqual(few, many)
+        # Unrequested reverse relations are not queried.
+        self.assertLess(many[1], many[0])
+
+
+class TestProfiling(QueryBudgetMixin, APITestCase):
+    def setUp(self) -> None:
+        superuser = User.objects.create_superuser("admin", "email@example.com", "admin")
+        superuser.save()
+        self.client.login(username="admin", password="admin")
+        parameters = GenerationParameters(teams=30, seed=3)
+        self.tournament = generate_tournament(parameters, name="Profiled")
+        make_pools(self.tournament)
+        generate_results(self.tournament, parameters)
+        metrics.reset()
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get(reverse("tournament-list"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total')
+        self.client.get(reverse("tournament-list"))
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tournament_list = response.json()["endpoints"]["tournament-list"]
+        self.assertEqual(tournament_list["requests"], 2)
+        self.assertEqual(sum(tournament_list["histogram"]), 2)
+        self.assertGreater(tournament_list["max_queries"], 0)
+
+    def test_query_budgets(self):
+        pool = self.tournament.pools.first()
+        round_obj = models.Round.objects.filter(pool=pool).first()
+        turn = round_obj.turns.first()
+        form = turn.forms.first()
+        team = turn.team
+        for url_name, pk in [
+            ("tournament", self.tournament.id), ("pool", pool.id), ("team", team.id),
+            ("participant", team.participants.first().id), ("round", round_obj.id), ("turn", turn.id),
+            ("form", form.id), ("score", form.scores.first().id),
+        ]:
+            self.get_within_budget(f"{url_name}-list", data={"tournament": self.tournament.id})
+            self.get_within_budget(f"{url_name}-detail", pk)
+        self.get_within_budget("team-list", data={"expand": "pool.tournament,participants"})
+        self.get_within_budget("tournament-snapshot", self.tournament.id)
+        self.get_within_budget("round-standings", round_obj.id)
+        self.get_within_budget("pool-standings", pool.id)
+
+        response = self.client.post(
+            reverse("form-scores", args=[form.id]), {"scores": [{"technique_score": 5, "presentation_score": 5}] * 5},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertWithinQueryBudget(response)
+        with self.assertRaises(AssertionError):
+            self.assertWithinQueryBudget(response, budget=1)
+
+    def test_budgets_per_method(self):
+        score = models.Score.objects.filter(form__turn__round__pool__tournament=self.tournament).first()
+        response = self.client.patch(reverse("score-detail", args=[score.id]), {"technique_score": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.assertWithinQueryBudget(response).query_budget, 7)
+        response = self.client.head(reverse("score-detail", args=[score.id]))
+        self.assertEqual(response.profile.query_budget, 4)
+        # Deletes cascade, so their query count has no fixed budget.
+        response = self.client.delete(reverse("pool-detail", args=[self.tournament.pools.first().id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertIsNone(response.profile.query_budget)
+        self.assertFalse(response.profile.over_budget)
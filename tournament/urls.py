@@ -5,21 +5,49 @@ from . import views
 urlpatterns = [
     path('tournaments/', views.TournamentList.as_view(), name="tournament-list"),
     path('tournaments/<int:pk>/', views.TournamentDetail.as_view(), name="tournament-detail"),
+    path('tournaments/<int:pk>/snapshot/', views.TournamentSnapshot.as_view(), name="tournament-snapshot"),
     path('tournaments/<int:pk>/make_pools/', views.MakePoolsEndpoint.as_view(), name="make-pools"),
+    path('tournaments/<int:pk>/assign_pools/', views.AssignPoolsEndpoint.as_view(), name="assign-pools"),
+    path('tournaments/<int:pk>/pool_jobs/', views.SubmitPoolJobEndpoint.as_view(), name="submit-pool-job"),
+    path('pool_jobs/<int:pk>/', views.PoolJobDetail.as_view(), name="pool-job-detail"),
+    path('tournaments/<int:pk>/schedule/', views.MakeScheduleEndpoint.as_view(), name="make-schedule"),
+    path('tournaments/<int:pk>/advance/', views.AdvanceEndpoint.as_view(), name="advance"),
+    path('tournaments/<int:pk>/mats/', views.MatPlanEndpoint.as_view(), name="mat-plan"),
+    path('tournaments/<int:pk>/register/', views.RegisterTeamsEndpoint.as_view(), name="register-teams"),
+    path('tournaments/<int:pk>/import/', views.ImportRegistrationsEndpoint.as_view(), name="import-registrations"),
+    path('tournaments/<int:pk>/export/<str:export_format>/', views.ExportResultsEndpoint.as_view(),
+         name="export-results"),
+    path('tournaments/<int:pk>/leaderboard/', views.ClassLeaderboardEndpoint.as_view(), name="class-leaderboard"),
+    path('tournaments/<int:pk>/live/', views.tournament_events, name="tournament-live"),
+    path('tournaments/<int:pk>/changes/', views.ChangesEndpoint.as_view(), name="tournament-changes"),
+    path('rulesets/', views.RulesetList.as_view(), name="ruleset-list"),
+    path('rulesets/<int:pk>/', views.RulesetDetail.as_view(), name="ruleset-detail"),
     path('pools/', views.PoolList.as_view(), name="pool-list"),
     path('pools/<int:pk>/', views.PoolDetail.as_view(), name="pool-detail"),
+    path('pools/<int:pk>/split/', views.SplitPoolEndpoint.as_view(), name="split-pool"),
+    path('pools/<int:pk>/overrun/', views.PoolOverrunEndpoint.as_view(), name="pool-overrun"),
+    path('pools/<int:pk>/live/', views.pool_events, name="pool-live"),
+    path('pools/<int:pk>/standings/', views.PoolStandingsEndpoint.as_view(), name="pool-standings"),
+    path('pools/<int:pk>/leaderboard/', views.PoolLeaderboardEndpoint.as_view(), name="pool-leaderboard"),
     path('teams/', views.TeamList.as_view(), name="team-list"),
     path('teams/<int:pk>/', views.TeamDetail.as_view(), name="team-detail"),
     path('participants/', views.ParticipantList.as_view(), name="participant-list"),
     path('participants/<int:pk>/', views.ParticipantDetail.as_view(), name="participant-detail"),
     path('rounds/', views.RoundList.as_view(), name="round-list"),
     path('rounds/<int:pk>/', views.RoundDetail.as_view(), name="round-detail"),
+    path('rounds/<int:pk>/advance/', views.AdvanceRoundEndpoint.as_view(), name="advance-round"),
+    path('rounds/<int:pk>/standings/', views.RoundStandingsEndpoint.as_view(), name="round-standings"),
+    path('rounds/<int:pk>/leaderboard/', views.RoundLeaderboardEndpoint.as_view(), name="round-leaderboard"),
     path('turns/', views.TurnList.as_view(), name="turn-list"),
     path('turns/<int:pk>/', views.TurnDetail.as_view(), name="turn-detail"),
+    path('turns/<int:pk>/scores/', views.TurnScoresEndpoint.as_view(), name="turn-scores"),
     path('forms/', views.FormList.as_view(), name="form-list"),
     path('forms/<int:pk>/', views.FormDetail.as_view(), name="form-detail"),
+    path('forms/<int:pk>/scores/', views.FormScoresEndpoint.as_view(), name="form-scores"),
     path('scores/', views.ScoreList.as_view(), name="score-list"),
     path('scores/<int:pk>/', views.ScoreDetail.as_view(), name="score-detail"),
+    path('batch/', views.BatchWriteEndpoint.as_view(), name="batch-write"),
+    path('metrics/', views.MetricsEndpoint.as_view(), name="metrics"),
 ]
 
 urlpatterns = format_suffix_patterns(urlpatterns)
@@ -0,0 +1,129 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Optional, Type
+
+from django.db.models import Count, F, Max, Model, QuerySet, Sum
+from django.db.models.signals import post_delete, post_save
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from tournament import models
+
+# For every model: the attribute pointing at its parent, and the lookup from Tournament to that parent.
+PARENT_LOOKUPS = {
+    models.Tournament: ("pk", "pk"),
+    models.Pool: ("tournament_id", "pk"),
+    models.Team: ("tournament_id", "pk"),
+    models.Participant: ("team_id", "teams"),
+    models.Round: ("pool_id", "pools"),
+    models.Turn: ("round_id", "pools__rounds"),
+    models.Form: ("turn_id", "pools__rounds__turns"),
+    models.Score: ("form_id", "pools__rounds__turns__forms"),
+}
+
+
+def bump_tournament_version(**lookup):
+    """ Increments the version of the tournament matching `lookup`, e.g. `bump_tournament_version(pk=1)`. """
+    models.Tournament.objects.filter(**lookup).update(version=F("version") + 1)
+
+
+_local = threading.local()
+
+
+@contextmanager
+def single_version_bump(**lookup):
+    """
+    Suspends per-object version bumps on this thread, and bumps the tournament matching `lookup` once on success.
+
+    Bulk operations use this so that their query count does not grow with the number of objects they touch.
+    """
+    suspended = getattr(_local, "suspended", False)
+    _local.suspended = True
+    try:
+        yield
+    finally:
+        _local.suspended = suspended
+    bump_tournament_version(**lookup)
+
+
+def deleted_directly(sender: Type[Model], origin) -> bool:
+    """ Whether an object was deleted itself, rather than along with the object it belongs to. """
+    if origin is None:
+        return True
+    if isinstance(origin, QuerySet):
+        return origin.model is sender
+    return isinstance(origin, sender)
+
+
+def object_changed(sender, instance, signal, raw: bool = False, **kwargs):
+    if raw or getattr(_local, "suspended", False):
+        return
+    # A delete bumps once, for the object it started from. A deleted tournament has no version left to bump.
+    if signal is post_delete and (sender is models.Tournament or not deleted_directly(sender, kwargs.get("origin"))):
+        return
+    parent_attribute, lookup = PARENT_LOOKUPS[sender]
+    bump_tournament_version(**{lookup: getattr(instance, parent_attribute)})
+
+
+for model in PARENT_LOOKUPS:
+    post_save.connect(object_changed, sender=model, dispatch_uid=f"version-save-{model.__name__}")
+    post_delete.connect(object_changed, sender=model, dispatch_uid=f"version-delete-{model.__name__}")
+
+
+class NotModified(Exception):
+    """ Ends a conditional GET early, before the view loads anything. """
+
+
+class ConditionalGetMixin:
+    """
+    Answers GET requests with an ETag derived from tournament versions, and with `304 Not Modified` when the client
+    already has it, without loading or serializing the requested objects.
+
+    Views set `tournament_lookup` to the lookup from Tournament to their own model, e.g. "pools__rounds" for rounds.
+    Detail views use the version of the object's tournament, list views the version of the tournament they are
+    filtered by, or an aggregate of all tournaments otherwise.
+    """
+    tournament_lookup: str = "pk"
+
+    def get_tournament_state(self, request, **kwargs) -> Optional[str]:
+        if "pk" in kwargs:
+            versions = models.Tournament.objects.filter(**{self.tournament_lookup: kwargs["pk"]})
+            version = versions.values_list("version", flat=True).first()
+            return None if version is None else str(version)
+        tournament_id = request.query_params.get("tournament")
+        if tournament_id is not None and tournament_id.isdigit():
+            version = models.Tournament.objects.filter(pk=tournament_id).values_list("version", flat=True).first()
+            return None if version is None else str(version)
+        state = models.Tournament.objects.aggregate(
+            count=Count("pk"), last_id=Max("pk"), last_created=Max("created"), versions=Sum("version"),
+        )
+        return f"{state['count']}-{state['last_id']}-{state['last_created']}-{state['versions']}"
+
+    def get_etag(self, request, **kwargs) -> Optional[str]:
+        state = self.get_tournament_state(request, **kwargs)
+        if state is None:
+            return None
+        key = "|".join([request.get_full_path(), request.headers.get("Accept", ""), state])
+        return f'"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+
+    def initial(self, request, *args, **kwargs):
+        # Runs after authentication and before the handler, so views that define their own `get` are covered too.
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method in ("GET", "HEAD"):
+            self.etag = self.get_etag(request, **kwargs)
+            if self.etag is not None and self.etag in parse_etags(request.headers.get("If-None-Match", "")):
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": self.etag})
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        etag = getattr(self, "etag", None)
+        if etag is not None and response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,155 +1,771 @@
-from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
+import io
+import random
+from typing import List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, ProtectedError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 import tournament.models as models
 import tournament.serializers as serializers
-from tournament.rules import belt_grade_to_class, D_CLASS, make_tournament_pools, tournament_pools_walker
+from tournament.assignment import assign_teams
+from tournament.changes import CHANGE_FIELDS, changes_since
+from tournament.exporting import CONTENT_TYPES, EXPORT_FORMATS, STREAMERS, result_rows
+from tournament.fieldsets import SparseFieldsetViewMixin
+from tournament.idempotency import operation_hash, purge_expired_keys, stored_keys
+from tournament.importing import IMPORT_FORMATS, ImportFailed, import_registrations
+from tournament.jobs import active_pool_job, submit_pool_job
+from tournament.leaderboards import class_leaderboard, pool_leaderboard, round_leaderboard
+from tournament.live import event_stream, pool_channel, tournament_channel
+from tournament.mats import TimeEstimate, plan_mats, replan_mats
+from tournament.profiling import allow_extra_queries, metrics
+from tournament.registration import register_teams
+from tournament.rules import make_pools, split_pools, split_tournament_pools, tournament_ruleset
+from tournament.schedule import RANDOM_ORDER, ScheduledRoundType, advance_rounds, make_first_rounds
+from tournament.scoring import submit_scores
+from tournament.standings import pool_standings, round_standings
+from tournament.versioning import ConditionalGetMixin
+
+
+def requested_max_pool_size(request):
+    serializer = serializers.PoolSplitSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data.get("max_pool_size", settings.TOURNAMENT_MAX_POOL_SIZE)
 
 
 class MakePoolsEndpoint(APIView):
+    """
+    Makes the pools of a tournament, splitting pools larger than `max_pool_size` if given, and lists the teams left
+    without a pool as `unassigned_teams`. Conflicts with a pool job that is queued or running for the tournament.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk: int):
-        tournament = models.Tournament.objects.get(id=pk)
-        pools = make_tournament_pools(tournament)
-        for pool in tournament_pools_walker(pools):
-            pool.save()
-
-        teams = models.Team.objects.filter(tournament=tournament)
-        team: models.Team
-        for team in teams:
-            team_class = D_CLASS  # Default
-            participant: models.Participant
-            for participant in team.participants.all():
-                belt_grade = participant.belt_grade
-                participant_class = belt_grade_to_class(belt_grade)
-                if participant_class.level > team_class.level:
-                    team_class = participant_class
-            if team.participants.count() == 1:
-                team.pool = pools[team_class][models.Pool.PoolType.Solo][team.participants.first().sex]
-            elif team.participants.count() == 2:
-                team.pool = pools[team_class][models.Pool.PoolType.Pair][models.Participant.Sexes.Female]
-            elif team.participants.count() > 2:
-                team.pool = pools[team_class][models.Pool.PoolType.Team][team.participants.first().sex]
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        max_pool_size = requested_max_pool_size(request)
+        with transaction.atomic():
+            # The same lock as submit_pool_job, so no job is queued while the pools are made here.
+            list(models.Tournament.objects.select_for_update().filter(pk=tournament.pk))
+            active = active_pool_job(tournament)
+            if active is not None:
+                return Response(
+                    {"detail": f"Pool job {active.pk} is making the pools of this tournament.", "job": active.pk},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            unassigned = make_pools(tournament)
+            split_tournament_pools(tournament, max_pool_size)
+
+        return Response({**serializers.TournamentSerializer(tournament).data, "unassigned_teams": unassigned})
+
+
+class AssignPoolsEndpoint(APIView):
+    """
+    Assigns late registrations to the existing pools of a tournament. Reassigns the given `teams`, or every team
+    without a pool if none are given, opening a new pool when all matching pools hold `max_pool_size` teams.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk: int):
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        serializer = serializers.AssignPoolsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        team_ids = serializer.validated_data.get("teams")
+        if team_ids is None:
+            team_ids = tournament.teams.filter(pool__isnull=True).values_list("pk", flat=True)
+
+        assigned = assign_teams(tournament, team_ids, requested_max_pool_size(request))
+        return Response({"assigned": [{"team": team_id, "pool": pool_id} for team_id, pool_id in assigned.items()]})
+
+
+def scheduled_rounds_data(scheduled: List[ScheduledRoundType]) -> List[dict]:
+    return [
+        {
+            "id": round_obj.id,
+            "pool": round_obj.pool_id,
+            "round_number": round_obj.round_number,
+            "teams": [turn.team_id for turn in turns],
+        }
+        for round_obj, turns in scheduled
+    ]
+
+
+class MakeScheduleEndpoint(APIView):
+    """
+    Creates round 1 with all turns for every pool of a tournament that has no rounds yet. Random turn orders are
+    reproducible from the returned seed.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"POST": 10}
+
+    def post(self, request, pk: int):
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        serializer = serializers.ScheduleRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        turn_order = serializer.validated_data["turn_order"]
+        seed = serializer.validated_data.get("seed")
+        if turn_order == RANDOM_ORDER and seed is None:
+            seed = random.randrange(2 ** 31)
+
+        scheduled = make_first_rounds(tournament, turn_order, seed)
+        return Response(
+            {"turn_order": turn_order, "seed": seed, "rounds": scheduled_rounds_data(scheduled)},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class AdvanceEndpoint(APIView):
+    """
+    Closes the latest round of every pool of a tournament and moves the `advance` best ranked teams of each to a new
+    round. Rounds with no more than `advance` turns are final and stay open.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"POST": 13}
+
+    def get_rounds(self, pk: int):
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        return models.Round.objects.filter(pool__tournament=tournament)
+
+    def post(self, request, pk: int):
+        rounds = self.get_rounds(pk)
+        serializer = serializers.AdvanceRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        turn_order = serializer.validated_data["turn_order"]
+
+        scheduled = advance_rounds(rounds, serializer.validated_data["advance"], turn_order)
+        return Response(
+            {"turn_order": turn_order, "rounds": scheduled_rounds_data(scheduled)},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class AdvanceRoundEndpoint(AdvanceEndpoint):
+    """ Closes one round and moves the `advance` best ranked teams of its pool to a new round. """
+
+    def get_rounds(self, pk: int):
+        return models.Round.objects.filter(pk=get_object_or_404(models.Round, id=pk).pk)
+
+
+class MatPlanEndpoint(APIView):
+    """ The mat and time slot of every pool. POST plans the tournament from scratch. """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk: int):
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        assignments = models.MatAssignment.objects.filter(tournament=tournament).order_by("mat", "start")
+        return Response(serializers.MatAssignmentSerializer(assignments, many=True).data)
+
+    def post(self, request, pk: int):
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        serializer = serializers.MatPlanRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        parameters = dict(serializer.validated_data)
+        mats = parameters.pop("mats")
+        assignments = plan_mats(tournament, mats, TimeEstimate(**parameters))
+        return Response(serializers.MatAssignmentSerializer(assignments, many=True).data,
+                        status=status.HTTP_201_CREATED)
+
+
+class PoolOverrunEndpoint(APIView):
+    """
+    Reports the new expected end of a running pool and re-plans the pools that have not started yet on `mats` mats, by
+    default as many as the plan uses.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk: int):
+        assignment = get_object_or_404(models.MatAssignment.objects.select_related("tournament"), pool_id=pk)
+        serializer = serializers.PoolOverrunSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            assignments = replan_mats(assignment.tournament, timezone.now(), {pk: serializer.validated_data["end"]},
+                                      serializer.validated_data.get("mats"))
+        except ValueError as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializers.MatAssignmentSerializer(assignments, many=True).data)
+
+
+class SubmitPoolJobEndpoint(APIView):
+    """
+    Queues pool creation for a tournament and returns the job right away. While a job is queued or running, posting
+    again returns that job instead of starting another.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk: int):
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        job, created = submit_pool_job(tournament, requested_max_pool_size(request))
+        return Response(
+            serializers.PoolJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
+        )
+
+
+class PoolJobDetail(generics.RetrieveAPIView):
+    permission_classes = [IsAuthenticated]
+
+    queryset = models.PoolJob.objects.all()
+    serializer_class = serializers.PoolJobSerializer
+
+
+class SplitPoolEndpoint(APIView):
+    """ Splits one pool into sub-pools of at most `max_pool_size` teams. """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk: int):
+        pool = get_object_or_404(models.Pool, id=pk)
+        max_pool_size = requested_max_pool_size(request)
+        if max_pool_size is None:
+            return Response({"max_pool_size": ["This field is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        new_pools = split_pools(models.Pool.objects.filter(pk=pool.pk), max_pool_size)
+        return Response(serializers.PoolSerializer([pool, *new_pools], many=True).data)
+
+
+class RegisterTeamsEndpoint(APIView):
+    """ Registers a list of teams with nested participants in one request. Invalid rows are reported, not created. """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk: int):
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        if not isinstance(request.data, list):
+            return Response({"detail": "Expected a list of teams."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ruleset = tournament_ruleset(tournament.pk)
+        valid_indices, valid_data, errors = [], [], []
+        for index, row in enumerate(request.data):
+            serializer = serializers.RegistrationTeamSerializer(data=row, context={"ruleset": ruleset})
+            if serializer.is_valid():
+                valid_indices.append(index)
+                valid_data.append(serializer.validated_data)
             else:
-                raise ValueError(f"Team {team} has no participants.")
-            team.save(update_fields=["pool"])
-        for pool in tournament.pools.all():
-            if pool.teams.count() == 0:
-                pool.delete()
+                errors.append({"index": index, "errors": serializer.errors})
+
+        registered = register_teams(tournament, valid_data)
+        created = [
+            {
+                "index": index,
+                "id": team.id,
+                "participants": [participant.id for participant in participants],
+            }
+            for index, (team, participants) in zip(valid_indices, registered)
+        ]
+        response_status = status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+        return Response({"created": created, "errors": errors}, status=response_status)
+
+
+class ImportRegistrationsEndpoint(APIView):
+    """ Streams an uploaded CSV or NDJSON registration file into the tournament in chunks. """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk: int):
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get("format") or upload.name.rsplit(".", 1)[-1].lower()
+        if file_format not in IMPORT_FORMATS:
+            return Response(
+                {"detail": f"Format {file_format} not one of: {IMPORT_FORMATS}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        try:
+            progress = import_registrations(tournament, lines, file_format)
+        except ImportFailed as error:
+            # Chunks before the unreadable line are committed, so the client learns what was already imported.
+            return Response(
+                {"detail": f"Could not read file: {error}", "line": error.line, "imported": error.progress.as_dict()},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(progress.as_dict(), status=status.HTTP_201_CREATED)
+
+
+class ExportResultsEndpoint(APIView):
+    """ Streams every score of a tournament, with its pool, round, turn and team, as CSV or NDJSON. """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk: int, export_format: str):
+        tournament = get_object_or_404(models.Tournament, id=pk)
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"detail": f"Format {export_format} not one of: {EXPORT_FORMATS}."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        response = StreamingHttpResponse(
+            STREAMERS[export_format](result_rows(tournament)),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = f'attachment; filename="tournament-{tournament.pk}.{export_format}"'
+        return response
+
+
+class FormScoresEndpoint(APIView):
+    """ Stores the scores of all judges for a form in one request, and returns the form's aggregated result. """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"POST": 13}
+
+    def post(self, request, pk: int):
+        form = get_object_or_404(models.Form.objects.select_related("turn"), id=pk)
+        serializer = serializers.FormScoresSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        return Response(serializers.TournamentSerializer(tournament).data)
+        results = submit_scores(form.turn, {form.pk: serializer.validated_data["scores"]})
+        return Response(results[0], status=status.HTTP_201_CREATED)
 
 
-class TournamentList(generics.ListCreateAPIView):
+class TurnScoresEndpoint(APIView):
+    """ Stores the scores of all judges for several forms of a turn in one request. """
     permission_classes = [IsAuthenticated]
+    query_budget = {"POST": 14}
+
+    def post(self, request, pk: int):
+        turn = get_object_or_404(models.Turn, id=pk)
+        serializer = serializers.TurnScoresSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        scores_by_form = {}
+        for form_data in serializer.validated_data["forms"]:
+            if form_data["form"] in scores_by_form:
+                return Response(
+                    {"forms": [f"Form {form_data['form']} is given more than once."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            scores_by_form[form_data["form"]] = form_data["scores"]
+        turn_forms = turn.forms.filter(pk__in=scores_by_form).values_list("pk", flat=True)
+        foreign_forms = set(scores_by_form) - set(turn_forms)
+        if foreign_forms:
+            return Response(
+                {"forms": [f"Form {form_id} is not a form of turn {turn.pk}." for form_id in sorted(foreign_forms)]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = submit_scores(turn, scores_by_form)
+        return Response({"turn": turn.pk, "forms": results}, status=status.HTTP_201_CREATED)
+
+
+class RoundStandingsEndpoint(ConditionalGetMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "pools__rounds"
+
+    def get(self, request, pk: int):
+        return Response(serializers.StandingSerializer(round_standings(pk), many=True).data)
+
+
+class PoolStandingsEndpoint(ConditionalGetMixin, APIView):
+    """ Standings of the latest round of a pool. """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "pools"
+
+    def get(self, request, pk: int):
+        return Response(serializers.StandingSerializer(pool_standings(pk), many=True).data)
+
+
+BATCH_SERIALIZERS = {
+    "turn": serializers.TurnSerializer,
+    "form": serializers.FormSerializer,
+    "score": serializers.ScoreSerializer,
+}
+
+
+def operation_error(operations: list, index: int, detail) -> ValidationError:
+    """ An error for one operation of a batch, shaped like the errors of a list serializer. """
+    return ValidationError({"operations": [detail if i == index else {} for i in range(len(operations))]})
+
+
+def apply_operation(operation: dict) -> Tuple[int, Optional[dict]]:
+    serializer_class = BATCH_SERIALIZERS[operation["model"]]
+    if operation["action"] == "create":
+        serializer = serializer_class(data=operation["data"])
+    else:
+        model = serializer_class.Meta.model
+        instance = model.objects.filter(pk=operation["id"]).first()
+        if instance is None:
+            raise ValidationError({"id": [f"{model.__name__} {operation['id']} does not exist."]})
+        if operation["action"] == "delete":
+            instance.delete()
+            return status.HTTP_204_NO_CONTENT, None
+        serializer = serializer_class(instance, data=operation["data"], partial=True)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    created = operation["action"] == "create"
+    return status.HTTP_201_CREATED if created else status.HTTP_200_OK, serializer.data
+
+
+def apply_batch(user, operations: List[dict]) -> List[dict]:
+    """
+    Applies a batch of operations in one transaction, replaying the stored result of operations whose key the user
+    sent before. Any failing operation rolls back the whole batch, and its keys are not stored.
+    """
+    results, new_keys = [], []
+    with transaction.atomic():
+        purge_expired_keys()
+        stored = stored_keys(user, (operation["key"] for operation in operations))
+        for index, operation in enumerate(operations):
+            fingerprint = operation_hash(operation)
+            key = stored.get(operation["key"])
+            if key is not None:
+                if key.operation_hash != fingerprint:
+                    raise operation_error(operations, index, {"key": ["Key was used for a different operation."]})
+                results.append({"key": key.key, "status": key.status, "data": key.result, "replayed": True})
+                continue
+            try:
+                result_status, data = apply_operation(operation)
+            except ValidationError as error:
+                raise operation_error(operations, index, error.detail)
+            new_keys.append(models.IdempotencyKey(
+                user=user, key=operation["key"], operation_hash=fingerprint, status=result_status, result=data,
+            ))
+            results.append({"key": operation["key"], "status": result_status, "data": data, "replayed": False})
+        models.IdempotencyKey.objects.bulk_create(new_keys)
+    return results
+
+
+class BatchWriteEndpoint(APIView):
+    """
+    Creates, updates and deletes turns, forms and scores in one transaction. Every operation has an idempotency key,
+    and retried operations return their stored result instead of being applied again.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"POST": 5}
+    # Creating a score costs the most: its standing, change log entry and version bump are written along with it.
+    queries_per_operation = 10
+
+    def post(self, request):
+        serializer = serializers.BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data["operations"]
+        allow_extra_queries(self.queries_per_operation * len(operations))
+        try:
+            results = apply_batch(request.user, operations)
+        except IntegrityError:
+            # A concurrent retry stored some of the keys first. Replay its results, or fail if that was not the cause.
+            if not stored_keys(request.user, (operation["key"] for operation in operations)):
+                raise
+            results = apply_batch(request.user, operations)
+        return Response({"results": results})
+
+
+class ChangesEndpoint(APIView):
+    """
+    The change log of a tournament after sequence number `since`, oldest first, as rows of `fields`. Clients pass
+    `last` as `since` of their next request, and page on while `more` is true.
+    """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+
+    def get(self, request, pk: int):
+        get_object_or_404(models.Tournament.objects.only("pk"), id=pk)
+        serializer = serializers.ChangesRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        since, limit = serializer.validated_data["since"], serializer.validated_data["limit"]
+        changes = list(changes_since(pk, since, limit + 1))
+        more = len(changes) > limit
+        changes = changes[:limit]
+        return Response({
+            "fields": CHANGE_FIELDS,
+            "changes": changes,
+            "last": changes[-1][0] if changes else since,
+            "more": more,
+        })
+
+
+def requested_top(request) -> int:
+    serializer = serializers.LeaderboardRequestSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data["top"]
+
+
+class RoundLeaderboardEndpoint(ConditionalGetMixin, APIView):
+    """ The `top` best turns of a round, ranked by their trimmed score. """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "pools__rounds"
+
+    def get(self, request, pk: int):
+        return Response(list(round_leaderboard(pk, requested_top(request))))
+
+
+class PoolLeaderboardEndpoint(ConditionalGetMixin, APIView):
+    """ The `top` best turns of the latest round of a pool. """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "pools"
+
+    def get(self, request, pk: int):
+        return Response(list(pool_leaderboard(pk, requested_top(request))))
+
+
+class ClassLeaderboardEndpoint(ConditionalGetMixin, APIView):
+    """ The `top` best teams of a competition class of a tournament per pool type, over all rounds. """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+
+    def get(self, request, pk: int):
+        serializer = serializers.ClassLeaderboardRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(list(class_leaderboard(pk, **serializer.validated_data)))
+
+
+class MetricsEndpoint(APIView):
+    """ Request metrics per URL name collected by the profiling middleware of this process, with latency histograms. """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics.snapshot())
+
+
+class LiveAccess(APIView):
+    """ Runs DRF's authentication and permission checks for the live views, which stream outside of DRF. """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk: int):
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+live_access = LiveAccess.as_view()
+
+
+def event_stream_view(channel_for_pk):
+    """ Makes a server-sent events view pushing the live changes of a channel. It only streams when served over ASGI. """
+    async def view(request, pk: int):
+        access = await sync_to_async(live_access)(request, pk=pk)
+        if access.status_code != status.HTTP_204_NO_CONTENT:
+            return access
+        if not isinstance(request, ASGIRequest):
+            # A WSGI worker would be held by the stream forever.
+            return HttpResponse("Live updates are only available when served over ASGI.", content_type="text/plain",
+                                status=status.HTTP_501_NOT_IMPLEMENTED)
+        response = StreamingHttpResponse(event_stream([channel_for_pk(pk)]), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+    return view
+
+
+tournament_events = event_stream_view(tournament_channel)
+pool_events = event_stream_view(pool_channel)
+
+
+class TournamentSnapshot(ConditionalGetMixin, generics.RetrieveAPIView):
+    """ A whole tournament in one response, read with one query per level of nesting. """
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 11}
+
+    queryset = models.Tournament.objects.prefetch_related(
+        Prefetch("pools", queryset=models.Pool.objects.order_by("id")),
+        Prefetch("pools__teams", queryset=models.Team.objects.order_by("id")),
+        Prefetch("pools__teams__participants", queryset=models.Participant.objects.order_by("id")),
+        Prefetch("pools__rounds", queryset=models.Round.objects.order_by("round_number")),
+        Prefetch("pools__rounds__turns", queryset=models.Turn.objects.order_by("turn_order")),
+        Prefetch("pools__rounds__turns__forms", queryset=models.Form.objects.order_by("id")),
+        Prefetch("pools__rounds__turns__forms__scores", queryset=models.Score.objects.order_by("id")),
+    )
+    serializer_class = serializers.TournamentSnapshotSerializer
+
+
+class TournamentList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4, "POST": 7}
 
     queryset = models.Tournament.objects.all()
     serializer_class = serializers.TournamentSerializer
 
 
-class TournamentDetail(generics.RetrieveUpdateDestroyAPIView):
+class TournamentDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4, "PUT": 10, "PATCH": 10}
 
     queryset = models.Tournament.objects.all()
     serializer_class = serializers.TournamentSerializer
 
 
-class PoolList(generics.ListCreateAPIView):
+class RulesetList(SparseFieldsetViewMixin, generics.ListCreateAPIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 3, "POST": 3}
+
+    queryset = models.Ruleset.objects.all()
+    serializer_class = serializers.RulesetSerializer
+
+
+class RulesetDetail(SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
+    permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 3, "PUT": 4, "PATCH": 4, "DELETE": 4}
+
+    queryset = models.Ruleset.objects.all()
+    serializer_class = serializers.RulesetSerializer
+
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response(
+                {"detail": "This ruleset is used by tournaments and cannot be deleted."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+
+class PoolList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
 
     queryset = models.Pool.objects.all()
+    filter_fields = {
+        "tournament": "tournament",
+    }
     serializer_class = serializers.PoolSerializer
 
 
-class PoolDetail(generics.RetrieveUpdateDestroyAPIView):
+class PoolDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "pools"
 
     queryset = models.Pool.objects.all()
     serializer_class = serializers.PoolSerializer
 
 
-class TeamList(generics.ListCreateAPIView):
+class TeamList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4, "POST": 7}
 
     queryset = models.Team.objects.all()
+    filter_fields = {
+        "tournament": "tournament",
+        "pool": "pool",
+    }
     serializer_class = serializers.TeamSerializer
 
 
-class TeamDetail(generics.RetrieveUpdateDestroyAPIView):
+class TeamDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "teams"
 
     queryset = models.Team.objects.all()
     serializer_class = serializers.TeamSerializer
 
 
-class ParticipantList(generics.ListCreateAPIView):
+class ParticipantList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4, "POST": 18}
 
     queryset = models.Participant.objects.all()
+    filter_fields = {
+        "tournament": "team__tournament",
+        "pool": "team__pool",
+        "team": "team",
+    }
     serializer_class = serializers.ParticipantSerializer
 
 
-class ParticipantDetail(generics.RetrieveUpdateDestroyAPIView):
+class ParticipantDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "teams__participants"
 
     queryset = models.Participant.objects.all()
     serializer_class = serializers.ParticipantSerializer
 
 
-class RoundList(generics.ListCreateAPIView):
+class RoundList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
 
     queryset = models.Round.objects.all()
+    filter_fields = {
+        "tournament": "pool__tournament",
+        "pool": "pool",
+    }
     serializer_class = serializers.RoundSerializer
 
 
-class RoundDetail(generics.RetrieveUpdateDestroyAPIView):
+class RoundDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "pools__rounds"
 
     queryset = models.Round.objects.all()
     serializer_class = serializers.RoundSerializer
 
 
-class TurnList(generics.ListCreateAPIView):
+class TurnList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
 
     queryset = models.Turn.objects.all()
+    filter_fields = {
+        "tournament": "round__pool__tournament",
+        "pool": "round__pool",
+        "round": "round",
+        "team": "team",
+    }
     serializer_class = serializers.TurnSerializer
 
 
-class TurnDetail(generics.RetrieveUpdateDestroyAPIView):
+class TurnDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "pools__rounds__turns"
 
     queryset = models.Turn.objects.all()
     serializer_class = serializers.TurnSerializer
 
 
-class FormList(generics.ListCreateAPIView):
+class FormList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
 
     queryset = models.Form.objects.all()
+    filter_fields = {
+        "tournament": "turn__round__pool__tournament",
+        "pool": "turn__round__pool",
+        "round": "turn__round",
+        "turn": "turn",
+        "team": "turn__team",
+    }
     serializer_class = serializers.FormSerializer
 
 
-class FormDetail(generics.RetrieveUpdateDestroyAPIView):
+class FormDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4}
+    tournament_lookup = "pools__rounds__turns__forms"
 
     queryset = models.Form.objects.all()
     serializer_class = serializers.FormSerializer
 
 
-class ScoreList(generics.ListCreateAPIView):
+class ScoreList(ConditionalGetMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4, "POST": 10}
 
     queryset = models.Score.objects.all()
+    filter_fields = {
+        "tournament": "form__turn__round__pool__tournament",
+        "pool": "form__turn__round__pool",
+        "round": "form__turn__round",
+        "turn": "form__turn",
+        "team": "form__turn__team",
+        "form": "form",
+    }
     serializer_class = serializers.ScoreSerializer
 
 
-class ScoreDetail(generics.RetrieveUpdateDestroyAPIView):
+class ScoreDetail(ConditionalGetMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 4, "PUT": 7, "PATCH": 7, "DELETE": 7}
+    tournament_lookup = "pools__rounds__turns__forms__scores"
 
     queryset = models.Score.objects.all()
     serializer_class = serializers.ScoreSerializer